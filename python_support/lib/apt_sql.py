@@ -2,6 +2,9 @@
 
 import argparse
 import csv
+import json
+import mmap
+import os
 from astropy.table import Table
 
 def arguments():
@@ -21,32 +24,69 @@ class Sqlfile:
     """
 
     def __init__(self, sqlfile):
-        """Read data from sql file. Get list of tables names.
+        """Scan sql file once, noting where each table's rows are.
         """
         self.__sqlfile = sqlfile
-        self.__sql = self.sqlread()
-        self.tablenames = self.tablenames()
+        self.__offsets = self.scan()
+        self.tablenames = sorted(self.__offsets)
 
-    def sqlread(self):
-        """Read sql file exported by APT. Strip trailing newlines.
+    def scan(self):
+        """Find byte offsets of the sql insert statements of each table.
+        Table names are parsed from the insert statements.
+        The offsets are cached in a '.index' file next to the sql file,
+        which is used while the sql file's size and mtime are unchanged.
         """
-        sql = list()
-        with open(self.__sqlfile, 'r') as f:
-            for line in f:
-                sql.append(line.rstrip())
-        return sql
+        stat = os.stat(self.__sqlfile)
+        index = self.__sqlfile + '.index'
+        try:
+            with open(index, 'r') as f:
+                cached = json.load(f)
+            if cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime:
+                return cached['offsets']
+        except (IOError, OSError, ValueError, KeyError):
+            pass
 
-    def tablenames(self):
-        """Parse sql insert statements to determine table names.
+        offsets = self.mmap_scan(stat.st_size)
+        try:
+            with open(index, 'w') as f:
+                json.dump({'size': stat.st_size, 'mtime': stat.st_mtime,
+                        'offsets': offsets}, f)
+        except (IOError, OSError):
+            pass
+        return offsets
+
+    def mmap_scan(self, size):
+        """Scan memory-mapped sql file for insert statements.
+        Return dictionary of table name to statement byte offsets.
         """
-        prefix = 'insert into '
-        names = list()
-        for line in self.__sql:
-            if line[:len(prefix)] == prefix:
-                names.append(line[len(prefix):line.find('(')].strip())
-        names = sorted(list(set(names)))
-        names.remove('#AOK values')
-        return names
+        prefix = b'insert into '
+        offsets = dict()
+        if size == 0:
+            return offsets
+        with open(self.__sqlfile, 'rb') as f:
+            sql = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                start = 0 if sql[:len(prefix)] == prefix else sql.find(b'\n' + prefix)
+                while start != -1:
+                    if sql[start:start + 1] == b'\n':
+                        start += 1
+                    end = sql.find(b'\n', start)
+                    line = sql[start:end + 1 if end != -1 else size]
+                    name = line[len(prefix):line.find(b'(')].strip().decode()
+                    offsets.setdefault(name, []).append(start)
+                    start = sql.find(b'\n' + prefix, start)
+            finally:
+                sql.close()
+        offsets.pop('#AOK values', None)
+        return offsets
+
+    def sqlread(self, tablename):
+        """Read the sql insert statements of a table. Strip trailing newlines.
+        """
+        with open(self.__sqlfile, 'rb') as f:
+            for offset in self.__offsets.get(tablename, []):
+                f.seek(offset)
+                yield f.readline().decode().rstrip()
 
     def rows_from_sql(self, tablename):
         """Return dictionary for each row in the specified table.
@@ -54,7 +94,7 @@ class Sqlfile:
         """
         prefix = 'insert into ' + tablename + ' '
         rows = list()
-        for line in self.__sql:
+        for line in self.sqlread(tablename):
             if line[:len(prefix)] == prefix:
                 keyval_str = line[len(prefix):].strip()
                 keystr, valstr = keyval_str.split('values')
@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+"""Benchmark the pool_tools operations on synthetic pools
+
+Each operation is run in a freshly spawned process, not a fork of
+this one, so that peak memory is measured per operation. Results are saved as JSON so runs against
+different versions of pool_tools and jwst.associations can be compared.
+
+example: pool_bench.py --rows 1000 10000 --output run.json
+         pool_bench.py --compare old.json new.json
+"""
+from __future__ import print_function
+import argparse
+import json
+import logging
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import time
+
+import pool_tools
+
+__all__ = [
+    'benchmark',
+    'compare',
+    'make_pool',
+    'make_programs',
+]
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(
+        logging.Formatter('%(levelname)s:%(module)s.%(funcName)s: %(message)s')
+    )
+    logger.addHandler(handler)
+
+OPERATIONS = ('asngen', 'pool_combine', 'pool_exam', 'get_pools')
+
+# Operations that read the pool cache, timed both without and with it
+CACHED_OPERATIONS = ('asngen', 'pool_exam')
+
+
+def arguments():
+    """Parse and return command line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark pool_tools on synthetic pools.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000],
+            help='Pool sizes, in rows, to benchmark')
+    parser.add_argument('--columns', type=int, default=50,
+            help='Number of columns in each pool')
+    parser.add_argument('--programs', type=int, default=10,
+            help='Number of programs')
+    parser.add_argument('--pools', type=int, default=3,
+            help='Number of pools per program')
+    parser.add_argument('--obs-per-mosaic', type=int, default=4,
+            help='Observations grouped into each mosaic candidate')
+    parser.add_argument('--operations', nargs='+', default=OPERATIONS,
+            choices=OPERATIONS, help='Operations to benchmark')
+    parser.add_argument('--output', default=None,
+            help='JSON file to save results to')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'),
+            help='Compare two saved results instead of running')
+    return parser.parse_args()
+
+
+def make_pool(path, program=1, seq=1, rows=1000, columns=50,
+              rows_per_obs=10, obs_per_mosaic=4):
+    """Write a synthetic pool file
+
+    Parameters
+    ----------
+    path: str
+        Folder to write the pool into.
+
+    program, seq: int
+        Program id and pool sequence number, used in the file name.
+
+    rows: int
+        Number of exposures.
+
+    columns: int
+        Total number of columns, including the ones the level 3
+        rules read.
+
+    rows_per_obs: int
+        Exposures in each observation candidate.
+
+    obs_per_mosaic: int
+        Observations grouped into each mosaic candidate.
+
+    Returns
+    -------
+    str
+        The pool file name.
+    """
+    required = [
+        'EXPNAME', 'PROGRAM', 'OBS_NUM', 'EXP_TYPE', 'INSTRUME', 'DETECTOR',
+        'OPT_ELEM', 'OPT_ELEM2', 'SUBARRAY', 'CHANNEL', 'PNTGTYPE', 'TARGETID',
+        'ASN_CANDIDATE',
+    ]
+    fillers = ['COL{:03d}'.format(idx) for idx in range(max(columns - len(required), 0))]
+    pool = os.path.join(path, 'jw{:05d}_{:03d}_20170101t{:06d}_pool.csv'.format(
+        program, seq, seq
+    ))
+    with open(pool, 'w') as fh:
+        fh.write('|'.join(required + fillers) + '\n')
+        for row in range(rows):
+            obs = row // rows_per_obs + 1
+            mosaic = (obs - 1) // obs_per_mosaic + 1
+            candidates = "[('o{:03d}', 'observation'), ('c{:04d}', 'mosaic')]".format(
+                obs, 1000 + mosaic
+            )
+            values = [
+                'jw{:05d}{:03d}001_01101_{:05d}_nrca1'.format(program, obs, row + 1),
+                '{:05d}'.format(program),
+                str(obs),
+                'NRC_IMAGE',
+                'NIRCAM',
+                'NRCA1',
+                'F{:03d}W'.format(100 + obs % 10),
+                'CLEAR',
+                'FULL',
+                'SHORT',
+                'SCIENCE',
+                str(mosaic),
+                candidates,
+            ] + [str(row * idx) for idx in range(len(fillers))]
+            fh.write('|'.join(values) + '\n')
+    return pool
+
+
+def make_programs(path, programs=10, pools=3, **kwargs):
+    """Write a folder of program folders of synthetic pools
+
+    Keyword arguments are passed to `make_pool`.
+
+    Returns
+    -------
+    [str[,...]]
+        The program folders.
+    """
+    program_paths = []
+    for program in range(1, programs + 1):
+        program_path = os.path.join(path, 'jw{:05d}'.format(program))
+        os.mkdir(program_path)
+        for seq in range(1, pools + 1):
+            make_pool(program_path, program=program, seq=seq, **kwargs)
+        program_paths.append(program_path)
+    return program_paths
+
+
+def benchmark(rows=(1000, 10000, 100000), columns=50, programs=10, pools=3,
+              obs_per_mosaic=4, operations=OPERATIONS):
+    """Run the benchmarks
+
+    Operations that use the pool cache are run twice: "cold",
+    with the cache removed, and "warm", with it in place.
+
+    Returns
+    -------
+    dict
+        The environment and a list of results, one per
+        operation, size and cache state.
+    """
+    results = {
+        'versions': _versions(),
+        'parameters': {
+            'columns': columns,
+            'programs': programs,
+            'pools': pools,
+            'obs_per_mosaic': obs_per_mosaic,
+        },
+        'results': [],
+    }
+    for nrows in rows:
+        path = mkdtemp(prefix='pool_bench_')
+        try:
+            program_paths = make_programs(
+                path, programs=programs, pools=pools, rows=nrows,
+                columns=columns, obs_per_mosaic=obs_per_mosaic
+            )
+            pool = sorted(pool_tools.get_pools(program_paths[0], latest=False))[0]
+            validation = pool_tools.validate_pool(pool)
+            if not validation['valid']:
+                raise RuntimeError('Synthetic pool is not valid: {}'.format(validation))
+            nbytes = os.path.getsize(pool)
+            for operation in operations:
+                if operation == 'get_pools':
+                    args = (path,)
+                    op_rows = programs * pools
+                    op_bytes = 0
+                elif operation == 'pool_combine':
+                    args = (program_paths[0],)
+                    op_rows = nrows * pools
+                    op_bytes = nbytes * pools
+                else:
+                    args = (pool,)
+                    op_rows = nrows
+                    op_bytes = nbytes
+                caches = ('cold', 'warm') if operation in CACHED_OPERATIONS else (None,)
+                for cache in caches:
+                    if cache == 'cold':
+                        rmtree(pool_tools._pool_cache_dir(pool), ignore_errors=True)
+                    elif cache == 'warm':
+                        _run_isolated('read_pool', args)
+                    elapsed, peak_rss = _run_isolated(operation, args)
+                    result = {
+                        'operation': operation,
+                        'rows': nrows,
+                        'cache': cache,
+                        'wall_time': elapsed,
+                        'peak_rss': peak_rss,
+                        'rows_per_sec': op_rows / elapsed,
+                        'bytes_per_sec': op_bytes / elapsed,
+                    }
+                    logger.info('{operation} rows={rows} cache={cache}: {wall_time:.3f}s '
+                                'peak_rss={peak_rss} rows/s={rows_per_sec:.0f}'.format(**result))
+                    results['results'].append(result)
+        finally:
+            rmtree(path)
+    return results
+
+
+def compare(base, new):
+    """Compare two saved benchmark results
+
+    Parameters
+    ----------
+    base, new: str
+        The JSON result files.
+
+    Returns
+    -------
+    [str[,...]]
+        One line per operation and size, with the ratio of
+        new to base wall time and peak memory.
+    """
+    with open(base) as fh:
+        base = json.load(fh)
+    with open(new) as fh:
+        new = json.load(fh)
+    base_results = {
+        (result['operation'], result['rows'], result.get('cache')): result
+        for result in base['results']
+    }
+    lines = ['base: {}'.format(base['versions']), 'new:  {}'.format(new['versions'])]
+    for result in new['results']:
+        key = (result['operation'], result['rows'], result.get('cache'))
+        if key not in base_results:
+            continue
+        lines.append('{} rows={} cache={}: time x{:.2f} peak_rss x{:.2f}'.format(
+            key[0], key[1], key[2],
+            result['wall_time'] / base_results[key]['wall_time'],
+            float(result['peak_rss']) / base_results[key]['peak_rss'],
+        ))
+    return lines
+
+
+def _operation(operation, args):
+    """Run one operation, returning elapsed time and peak RSS"""
+    import resource
+
+    start = time()
+    if operation == 'asngen':
+        pool_tools.asngen(*args)
+    elif operation == 'pool_combine':
+        os.remove(pool_tools.pool_combine(*args))
+    elif operation == 'pool_exam':
+        pool_tools.read_pool_columns(args[0], ['EXPNAME', 'OPT_ELEM'])
+    elif operation == 'read_pool':
+        pool_tools.read_pool(args[0])
+    elif operation == 'get_pools':
+        root = args[0]
+        for program in sorted(os.listdir(root)):
+            list(pool_tools.get_pools(os.path.join(root, program)))
+    elapsed = time() - start
+    return elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _run_isolated(operation, args):
+    """Run an operation in a fresh process
+
+    The process is spawned: a forked child would start with this
+    process's memory, and its peak RSS with it.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+        return executor.submit(_operation, operation, args).result()
+
+
+def _versions():
+    """Versions of the packages being benchmarked"""
+    import platform
+    import astropy
+    import jwst
+    return {
+        'python': platform.python_version(),
+        'astropy': astropy.__version__,
+        'jwst': jwst.__version__,
+    }
+
+
+def main():
+    args = arguments()
+    if args.compare:
+        print('\n'.join(compare(*args.compare)))
+        return
+
+    results = benchmark(
+        rows=args.rows, columns=args.columns, programs=args.programs,
+        pools=args.pools, obs_per_mosaic=args.obs_per_mosaic,
+        operations=args.operations
+    )
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
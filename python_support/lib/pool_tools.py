@@ -1,8 +1,9 @@
 from __future__ import print_function
+from contextlib import contextmanager
 import logging
 import re
 
-from astropy.table import Table
+from astropy.table import Table, vstack
 
 from jwst.associations import (
     AssociationRegistry,
@@ -13,17 +14,34 @@ from jwst.associations.association import make_timestamp
 from jwst.associations.lib.rules_level3 import _DMS_POOLNAME_REGEX
 
 __all__ = [
+    'IncrementalAsngen',
+    'PoolIndex',
     'all_programs',
+    'all_programs_table',
     'asngen',
+    'asngen_many',
+    'asngen_profile',
+    'asngen_write',
+    'clear_registry_cache',
     'exam_program_pools',
     'get_pools',
+    'get_registry',
+    'iter_asns',
     'make_poolname',
     'make_timestamp',
     'pool_combine',
+    'pool_diff',
     'pool_exam',
     'python_path',
+    'read_pool',
+    'read_pool_columns',
+    'validate_pool',
+    'validate_pools',
 ]
 
+# Columns a pool must have for association generation
+REQUIRED_POOL_COLUMNS = ('ASN_CANDIDATE', 'EXPNAME', 'EXP_TYPE', 'PROGRAM')
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 if not logger.handlers:
@@ -34,11 +52,345 @@ if not logger.handlers:
     logger.addHandler(handler)
 
 
-def asngen(pool):
-    """Default ASN generator for given pool"""
-    pool = AssociationPool.read(pool)
-    rules = AssociationRegistry()
-    (asns, orphaned) = generate(pool, rules)
+class PoolIndex(object):
+    """Persistent index of the pools under a folder of programs
+
+    The index is an SQLite database recording, for each pool, the
+    program, sequence and timestamp parsed from the name, along with
+    size and modification time. A folder is only rescanned when its
+    modification time changes, i.e. when pools are added, removed or
+    renamed.
+
+    Parameters
+    ----------
+    path: str
+        The folder of programs to index.
+
+    index_file: str or None
+        The database file. If None, `.pool_index.sqlite` in `path`.
+        It should not be inside a program folder, since writing
+        it changes the folder's modification time.
+    """
+
+    def __init__(self, path='.', index_file=None):
+        import sqlite3
+        from os.path import join
+        from threading import RLock
+
+        self.path = python_path(path)
+        self.lock = RLock()
+        if index_file is None:
+            index_file = join(self.path, '.pool_index.sqlite')
+        self.index_file = index_file
+        self.db = sqlite3.connect(index_file, check_same_thread=False)
+        with self.db:
+            self.db.executescript('''
+                CREATE TABLE IF NOT EXISTS dirs (
+                    dir TEXT PRIMARY KEY,
+                    mtime REAL
+                );
+                CREATE TABLE IF NOT EXISTS pools (
+                    dir TEXT,
+                    name TEXT,
+                    program TEXT,
+                    seq TEXT,
+                    timestamp TEXT,
+                    size INTEGER,
+                    mtime REAL,
+                    PRIMARY KEY (dir, name)
+                );
+            ''')
+
+    def close(self):
+        self.db.close()
+
+    def get_pools(self, program_path='.', latest=True):
+        """Pools of a program, from the index
+
+        Parameters match `get_pools`. The program folder is
+        rescanned first if it has changed.
+        """
+        from os.path import join
+
+        program_dir = python_path(program_path)
+        query = 'SELECT name FROM pools WHERE dir = ? ORDER BY name DESC'
+        if latest:
+            query += ' LIMIT 1'
+        with self.lock:
+            self.refresh_dir(program_dir)
+            names = [row[0] for row in self.db.execute(query, (program_dir,))]
+        if latest and not names:
+            raise IndexError('No pools in "{}"'.format(program_path))
+        return [join(program_path, name) for name in names]
+
+    def programs(self):
+        """The indexed program folders, refreshing the index first"""
+        with self.lock:
+            self.refresh()
+            return [
+                row[0] for row in
+                self.db.execute('SELECT DISTINCT dir FROM pools ORDER BY dir')
+            ]
+
+    def refresh(self):
+        """Rescan any changed program folders
+
+        The top folder itself is not indexed: the database lives
+        there by default and every commit would change its
+        modification time, forcing a rescan on each call.
+        """
+        from os import listdir
+        from os.path import isdir, join
+
+        for fname in listdir(self.path):
+            program_dir = join(self.path, fname)
+            if isdir(program_dir):
+                self.refresh_dir(program_dir)
+
+    def refresh_dir(self, program_dir):
+        """Rescan a folder if its modification time has changed
+
+        Returns
+        -------
+        bool
+            True if the folder was rescanned.
+        """
+        from glob import glob
+        from os import stat
+        from os.path import basename
+
+        with self.lock:
+            try:
+                mtime = stat(program_dir).st_mtime
+            except OSError:
+                mtime = None
+            row = self.db.execute(
+                'SELECT mtime FROM dirs WHERE dir = ?', (program_dir,)
+            ).fetchone()
+            if row is not None and row[0] == mtime:
+                return False
+
+            logger.debug('Indexing "{}"'.format(program_dir))
+            entries = []
+            for pool in glob(program_dir + '/*_pool.csv'):
+                name = basename(pool)
+                parsed = re.search(_DMS_POOLNAME_REGEX, name)
+                program, seq, timestamp = parsed.groups()[:3] if parsed else (None, None, None)
+                pool_stat = stat(pool)
+                entries.append((
+                    program_dir, name, program, seq, timestamp,
+                    pool_stat.st_size, pool_stat.st_mtime
+                ))
+            with self.db:
+                self.db.execute('DELETE FROM pools WHERE dir = ?', (program_dir,))
+                self.db.executemany(
+                    'INSERT INTO pools VALUES (?, ?, ?, ?, ?, ?, ?)', entries
+                )
+                self.db.execute(
+                    'INSERT OR REPLACE INTO dirs VALUES (?, ?)', (program_dir, mtime)
+                )
+            return True
+
+
+class IncrementalAsngen(object):
+    """Regenerate associations only for the parts of a pool that changed
+
+    Pool rows are linked together by the candidates they share in
+    `candidate_column`; each linked group of rows is generated on its
+    own. A fingerprint of the rows in each group is remembered with the
+    associations it produced, so on the next call only groups that
+    gained, lost or changed exposures are regenerated. Observations
+    sharing a mosaic candidate form one group. If the rule files
+    change, everything is regenerated.
+
+    The first call, and any call where most groups changed, is slower
+    than a single `generate`, since every group is generated separately
+    and every row is hashed. It pays off when few groups change between
+    calls, such as when a pool gains exposures in a few observations.
+    The time spent hashing and generating is logged.
+
+    Reusing results assumes associations never span rows with no
+    candidate in common, which holds for the candidate-based level 3
+    rules. Use `verify` to check this against a full run.
+
+    Parameters
+    ----------
+    rules: AssociationRegistry or None
+        The rules to use. If None, the cached default registry is used
+        and rule file changes are detected.
+
+    candidate_column: str
+        Pool column listing the candidates of each exposure.
+
+    verify: bool
+        If True, every call that reuses results also does a full run
+        and, if the results differ, logs a warning and returns the full
+        run instead.
+    """
+
+    def __init__(self, rules=None, candidate_column='ASN_CANDIDATE', verify=False):
+        self.rules = rules
+        self.candidate_column = candidate_column
+        self.verify = verify
+        self.reset()
+
+    def reset(self):
+        """Forget all previous results"""
+        self.rules_key = None
+        self.pool_name = None
+        self.groups = {}
+
+    def generate(self, pool):
+        """Generate associations, reusing unchanged groups
+
+        Parameters
+        ----------
+        pool: str or AssociationPool
+            The pool to generate from.
+
+        Returns
+        -------
+        (asns, orphaned)
+            As returned by `generate`.
+        """
+        from os.path import basename, splitext
+        from time import time
+
+        pool_file = pool
+        if not isinstance(pool, AssociationPool):
+            pool = read_pool(pool)
+        pool_file = pool.meta.get('pool_file', pool_file)
+        pool_name = splitext(basename(pool_file))[0] if isinstance(pool_file, str) else None
+        rules = self.rules
+        if rules is None:
+            rules_key = _rule_files_key()
+            rules = get_registry()
+            if rules_key != self.rules_key:
+                if self.rules_key is not None:
+                    logger.info('Rules have changed, regenerating everything')
+                self.reset()
+                self.rules_key = rules_key
+        renamed = (
+            self.pool_name is not None and pool_name is not None and
+            pool_name != self.pool_name
+        )
+
+        start = time()
+        row_hashes = [_row_hash(row) for row in pool.iterrows()]
+        groups = {}
+        for indices in self._link_rows(pool):
+            fingerprint = _fingerprint(row_hashes[index] for index in indices)
+            groups[fingerprint] = indices
+        hash_time = time() - start
+
+        start = time()
+        results = {}
+        asns = []
+        orphaned = []
+        regenerated = 0
+        for fingerprint, indices in groups.items():
+            try:
+                group_asns, group_orphaned = self.groups[fingerprint]
+            except KeyError:
+                group_asns, group_orphaned = generate(pool[indices], rules)
+                regenerated += 1
+            else:
+                if renamed:
+                    for assoc in group_asns:
+                        _rename_asn_pool(assoc, self.pool_name, pool_name)
+            results[fingerprint] = (group_asns, group_orphaned)
+            asns.extend(group_asns)
+            if len(group_orphaned):
+                orphaned.append(group_orphaned)
+        if len(orphaned) > 1:
+            orphaned = vstack(orphaned)
+        elif orphaned:
+            orphaned = orphaned[0]
+        else:
+            orphaned = pool[[]]
+        logger.info(
+            'Groups regenerated: {:d} of {:d}, hashing {:.3f}s, generating {:.3f}s'.format(
+                regenerated, len(groups), hash_time, time() - start
+            )
+        )
+
+        if self.verify and regenerated < len(groups):
+            full_asns, full_orphaned = generate(pool, rules)
+            if not _same_asns((asns, orphaned), (full_asns, full_orphaned)):
+                logger.warning('Incremental results differ from a full run, using the full run')
+                asns, orphaned = full_asns, full_orphaned
+                results = {}
+
+        self.groups = results
+        self.pool_name = pool_name
+        return asns, orphaned
+
+    def load(self, path):
+        """Restore previous results saved with `save`"""
+        import pickle
+        with open(path, 'rb') as fh:
+            self.rules_key, self.pool_name, self.groups = pickle.load(fh)
+
+    def save(self, path):
+        """Save results for use in a later session"""
+        import pickle
+        with open(path, 'wb') as fh:
+            pickle.dump(
+                (self.rules_key, self.pool_name, self.groups), fh,
+                protocol=pickle.HIGHEST_PROTOCOL
+            )
+
+    def _link_rows(self, pool):
+        """Group row indices of rows sharing any candidate"""
+        if self.candidate_column not in pool.colnames:
+            return [list(range(len(pool)))]
+
+        parents = {}
+
+        def find(item):
+            while parents[item] != item:
+                parents[item] = parents[parents[item]]
+                item = parents[item]
+            return item
+
+        row_candidates = []
+        for row in pool:
+            candidates = re.findall(r"\(\s*'([^']+)'", str(row[self.candidate_column]))
+            row_candidates.append(candidates)
+            for candidate in candidates:
+                parents.setdefault(candidate, candidate)
+            for candidate in candidates[1:]:
+                parents[find(candidate)] = find(candidates[0])
+
+        links = {}
+        for index, candidates in enumerate(row_candidates):
+            root = find(candidates[0]) if candidates else None
+            links.setdefault(root, []).append(index)
+        return [links[root] for root in sorted(links, key=str)]
+
+
+def asngen(pool, rules=None, incremental=None):
+    """Default ASN generator for given pool
+
+    Parameters
+    ----------
+    pool: str
+        The pool file to generate from.
+
+    rules: AssociationRegistry or None
+        The rules to use. If None, the cached default registry is used.
+
+    incremental: IncrementalAsngen or None
+        If given, generate through it, reusing its previous results.
+        `rules` is then ignored.
+    """
+    if incremental is not None:
+        (asns, orphaned) = incremental.generate(pool)
+    else:
+        pool = read_pool(pool)
+        if rules is None:
+            rules = get_registry()
+        (asns, orphaned) = generate(pool, rules)
     result = []
     result.append('There where {:d} associations found.'.format(len(asns)))
     result.append('There where {:d} orphaned exposures.'.format(len(orphaned)))
@@ -48,13 +400,186 @@ def asngen(pool):
     return '\n'.join(result)
 
 
-def exam_program_pools(colname, program_path='.', latest=True):
-    for pool in get_pools(program_path=program_path, latest=latest):
+def asngen_many(pools, max_workers=None, validate=False):
+    """Run `asngen` over many pools in parallel
+
+    The rule registry is built once per worker process, not per pool.
+
+    Parameters
+    ----------
+    pools: [str[,...]]
+        The pool files, such as from `get_pools(latest=False)`.
+
+    max_workers: int or None
+        Number of worker processes. If None, the number of CPUs is used.
+        If 1, all pools are done in the current process.
+
+    validate: bool
+        Check the pools with `validate_pools` first. Invalid pools
+        are not generated from.
+
+    Returns
+    -------
+    [(pool, result, elapsed)[,...]]
+        For each pool, in the order given, the `asngen` result
+        and the time, in seconds, it took. For pools that failed,
+        the result is the exception.
+    """
+    pools = list(pools)
+    invalid = set()
+    if validate:
+        summary = validate_pools(pools, max_workers=max_workers)
+        invalid = set(summary['pool'][~summary['valid']])
+    todo = [pool for pool in pools if pool not in invalid]
+
+    if max_workers == 1:
+        _asngen_init()
+        results = [_asngen_pool(pool) for pool in todo]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(
+                max_workers=max_workers, initializer=_asngen_init
+        ) as executor:
+            results = list(executor.map(_asngen_pool, todo))
+
+    if invalid:
+        results = iter(results)
+        results = [
+            (pool, ValueError('Pool "{}" failed validation'.format(pool)), 0.)
+            if pool in invalid else next(results)
+            for pool in pools
+        ]
+    return results
+
+
+def asngen_profile(pool, rules=None, profile=False, trace_memory=False, nstats=20):
+    """Generate associations, timing each phase
+
+    The phases are reading the pool, getting the rules, and
+    generating the associations. A text report and a JSON report
+    are logged.
+
+    Parameters
+    ----------
+    pool: str
+        The pool file to generate from.
+
+    rules: AssociationRegistry or None
+        The rules to use. If None, the cached default registry is used;
+        call `clear_registry_cache` first to time building it.
+
+    profile: bool
+        Run cProfile around each phase.
+
+    trace_memory: bool
+        Run tracemalloc around each phase to find peak memory.
+        If tracemalloc is already tracing, it is left running and
+        the peak includes allocations made before the phase.
+
+    nstats: int
+        Number of functions, by cumulative time, to include
+        from each profile.
+
+    Returns
+    -------
+    dict
+        The report.
+    """
+    import json
+
+    report = {'pool': pool, 'phases': []}
+    with _phase(report, 'read', profile, trace_memory, nstats):
+        pool_table = read_pool(pool)
+    with _phase(report, 'registry', profile, trace_memory, nstats):
+        if rules is None:
+            rules = get_registry()
+    with _phase(report, 'generate', profile, trace_memory, nstats):
+        asns, orphaned = generate(pool_table, rules)
+    report['n_rows'] = len(pool_table)
+    report['n_asns'] = len(asns)
+    report['n_orphaned'] = len(orphaned)
+
+    lines = ['Pool "{}": {:d} rows, {:d} associations, {:d} orphaned'.format(
+        pool, report['n_rows'], report['n_asns'], report['n_orphaned']
+    )]
+    for phase in report['phases']:
+        line = '    {:<10} {:9.3f}s'.format(phase['phase'], phase['time'])
+        if 'peak_memory' in phase:
+            line += ' {:10.1f} MB peak'.format(phase['peak_memory'] / 1e6)
+        lines.append(line)
+        if 'profile' in phase:
+            lines.append(phase['profile'])
+    logger.info('\n'.join(lines))
+    logger.info('Report: {}'.format(json.dumps(report)))
+    return report
+
+
+def asngen_write(pool, output_dir='.', rules=None, incremental=None):
+    """Generate associations and write each to its own JSON file
+
+    Files are written as associations are produced, so no combined
+    text of all associations is ever built.
+
+    Parameters
+    ----------
+    pool: str
+        The pool file to generate from.
+
+    output_dir: str
+        Folder to write the association files to.
+
+    rules, incremental:
+        As for `asngen`.
+
+    Returns
+    -------
+    [dict[,...]]
+        The summary of each association written, with the file
+        name under "path".
+    """
+    from os.path import join
+
+    summaries = []
+    for summary, assoc in iter_asns(pool, rules=rules, incremental=incremental):
+        name, serialized = assoc.dump(format='json')
+        summary['path'] = join(output_dir, name)
+        with open(summary['path'], 'w') as fh:
+            fh.write(serialized)
+        summaries.append(summary)
+    logger.info('Wrote {:d} associations to "{}"'.format(len(summaries), output_dir))
+    return summaries
+
+
+def clear_registry_cache():
+    """Forget all cached registries"""
+    _registry_cache.clear()
+
+
+def exam_program_pools(colname, program_path='.', latest=True, index=None):
+    for pool in get_pools(program_path=program_path, latest=latest, index=index):
         logger.info('Pool="{}"'.format(pool))
         pool_exam(pool, colname)
 
 
-def get_pools(program_path='.', latest=True):
+def get_pools(program_path='.', latest=True, index=None):
+    """Find the pools of a program
+
+    Parameters
+    ----------
+    program_path: str
+        The program folder.
+
+    latest: bool
+        Only return the latest pool.
+
+    index: PoolIndex or None
+        If given, answer from the index instead of globbing.
+    """
+    if index is not None:
+        for pool in index.get_pools(program_path, latest=latest):
+            yield pool
+        return
+
     from glob import glob
     pools = glob(program_path + '/*_pool.csv')
     if latest:
@@ -64,16 +589,149 @@ def get_pools(program_path='.', latest=True):
             yield pool
 
 
+def get_registry(definition_files=None):
+    """Return a cached AssociationRegistry
+
+    The registry is rebuilt only when the rule files, either the
+    default level 3 rules or the given ones, have changed.
+
+    Parameters
+    ----------
+    definition_files: [str[,...]] or None
+        Extra rule files. If None, only the default rules are used.
+    """
+    key = _rule_files_key(definition_files)
+    try:
+        return _registry_cache[key]
+    except KeyError:
+        pass
+
+    logger.debug('Building registry for {}'.format(key))
+    if definition_files is None:
+        rules = AssociationRegistry()
+    else:
+        rules = AssociationRegistry(definition_files=definition_files)
+    _registry_cache[key] = rules
+    return rules
+
+
+def iter_asns(pool, rules=None, incremental=None):
+    """Generate associations for a pool one at a time
+
+    This avoids building the joined report string of `asngen`, and
+    each association is released once the consumer moves on to the
+    next one. It does not keep memory flat: `generate` still builds
+    the full list of associations before the first one is yielded,
+    so peak memory is that of the complete result.
+
+    Parameters
+    ----------
+    pool: str
+        The pool file to generate from.
+
+    rules, incremental:
+        As for `asngen`.
+
+    Yields
+    ------
+    (summary, assoc)
+        `summary` is a dict of "asn_type", "product_name"
+        and "n_members".
+    """
+    if incremental is not None:
+        asns, orphaned = incremental.generate(pool)
+    else:
+        if rules is None:
+            rules = get_registry()
+        asns, orphaned = generate(read_pool(pool), rules)
+    logger.info('There where {:d} orphaned exposures.'.format(len(orphaned)))
+    del orphaned
+
+    asns.reverse()
+    while asns:
+        assoc = asns.pop()
+        yield _asn_summary(assoc), assoc
+
+
+def pool_diff(old_pool, new_pool, key='EXPNAME', delimiter='|'):
+    """Find the exposures that differ between two pools
+
+    Both pools are read line by line, without parsing into tables.
+    Rows are matched on the `key` column, and compared on a hash
+    of the columns common to both pools.
+
+    Parameters
+    ----------
+    old_pool, new_pool: str
+        The pool files to compare.
+
+    key: str
+        The column identifying an exposure.
+
+    delimiter: str
+        The column delimiter.
+
+    Returns
+    -------
+    dict
+        With lists "added", "removed" and "modified" of exposures, and
+        lists "columns_added" and "columns_removed" of column names.
+        Exposures are in the order they appear in their pool: "added"
+        and "modified" in the new pool, "removed" in the old one.
+
+    Raises
+    ------
+    KeyError
+        `key` is not a column of both pools.
+
+    ValueError
+        A row has the wrong number of columns, or an exposure
+        appears more than once in a pool.
+    """
+    from collections import OrderedDict
+
+    old_header = _pool_header(old_pool, delimiter)
+    new_header = _pool_header(new_pool, delimiter)
+    common = [name for name in new_header if name in old_header]
+    if key not in common:
+        raise KeyError(key)
+
+    old_rows = OrderedDict(_pool_row_hashes(old_pool, old_header, common, key, delimiter))
+    added = []
+    modified = []
+    for exposure, row_hash in _pool_row_hashes(new_pool, new_header, common, key, delimiter):
+        try:
+            old_hash = old_rows.pop(exposure)
+        except KeyError:
+            added.append(exposure)
+            continue
+        if old_hash != row_hash:
+            modified.append(exposure)
+
+    diff = {
+        'added': added,
+        'removed': list(old_rows),
+        'modified': modified,
+        'columns_added': [name for name in new_header if name not in old_header],
+        'columns_removed': [name for name in old_header if name not in new_header],
+    }
+    logger.info('Pool diff "{}" -> "{}": {}'.format(
+        old_pool, new_pool,
+        ', '.join('{} {:d}'.format(name, len(value)) for name, value in diff.items())
+    ))
+    return diff
+
+
 def pool_exam(pool, colname):
     """Show the column from the pool file for specified program"""
-    tbl = Table.read(pool, format='ascii')
     try:
+        tbl = read_pool_columns(pool, [colname])
         logger.info('\n'.join([' ', tbl[colname].__str__()]))
     except KeyError:
         logger.error('No column "{}" in pool "{}"'.format(colname, pool))
 
 
-def all_programs(colname, path='.', latest=True):
+def all_programs(colname, path='.', latest=True, index=None):
     """Go through all programs in the specified directory
     Parameters
     ----------
@@ -83,6 +741,9 @@ def all_programs(colname, path='.', latest=True):
     path: str
         The folder path to look for programs.
         This can be specified using local vernacular.
+
+    index: PoolIndex or None
+        If given, find pools from the index.
     """
     from os import listdir
     from os.path import isdir
@@ -90,12 +751,82 @@ def all_programs(colname, path='.', latest=True):
         if isdir(fname):
             logger.info('>>>> Program {}:'.format(fname))
             try:
-                exam_program_pools(colname, program_path=fname, latest=latest)
+                exam_program_pools(
+                    colname, program_path=fname, latest=latest, index=index
+                )
             except IndexError:
                 """No files, no matter"""
                 pass
 
 
+def all_programs_table(colname, path='.', latest=True, index=None, max_workers=8):
+    """Collect a column from the pools of all programs in a folder
+
+    Programs are examined concurrently by a pool of threads.
+
+    Parameters
+    ----------
+    colname: str
+        The column to collect.
+
+    path: str
+        The folder path to look for programs.
+        This can be specified using local vernacular.
+
+    latest: bool
+        Only examine the latest pool of each program.
+
+    index: PoolIndex or None
+        If given, find pools from the index.
+
+    max_workers: int
+        Number of threads.
+
+    Returns
+    -------
+    Table
+        With columns "program", "pool" and `colname`, one row per value,
+        ordered by program.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from os import listdir
+    from os.path import isdir, join
+
+    root = python_path(path)
+    programs = sorted(
+        fname for fname in listdir(root)
+        if isdir(join(root, fname))
+    )
+
+    def program_values(program):
+        rows = []
+        try:
+            pools = sorted(get_pools(
+                program_path=join(root, program), latest=latest, index=index
+            ))
+        except IndexError:
+            return rows
+        for pool in pools:
+            try:
+                values = read_pool_columns(pool, [colname])[colname]
+            except KeyError:
+                logger.error('No column "{}" in pool "{}"'.format(colname, pool))
+                continue
+            rows.extend((program, pool, value) for value in values)
+        return rows
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        rows = [
+            row
+            for program_rows in executor.map(program_values, programs)
+            for row in program_rows
+        ]
+
+    if rows:
+        return Table(rows=rows, names=('program', 'pool', colname))
+    return Table(names=('program', 'pool', colname), dtype=(str, str, str))
+
+
 def python_path(path):
     from os.path import abspath, expanduser, expandvars
     return abspath(expanduser(expandvars(path)))
@@ -105,18 +836,323 @@ def pool_combine(program_path='.', seq='999'):
     """Combine pools into one
 
     This skips the header line of all the pool files, except the first.
+    All header lines must be identical. The pool bodies are copied
+    in-kernel where possible and the result is written to a temporary
+    file which is renamed into place only when complete.
+
+    Returns
+    -------
+    str
+        The path of the new pool.
     """
+    from os import close, fstat, remove, rename, write
     from os.path import dirname
-    from subprocess import call
+    from shutil import copymode
+    from tempfile import mkstemp
+    from time import time
 
-    new_pool = None
-    for pool in get_pools(program_path=program_path, latest=False):
-        if new_pool is None:
-            path = dirname(pool)
-            new_pool = open('/'.join([path, make_poolname(pool, seq=seq)]), 'w')
-            call(['head', '-n', '1', pool], stdout=new_pool)
-        call(['tail', '-n', '+2', pool], stdout=new_pool)
-    new_pool.close()
+    pools = sorted(get_pools(program_path=program_path, latest=False))
+    if not pools:
+        raise IndexError('No pools found in "{}"'.format(program_path))
+    path = dirname(pools[0])
+    new_pool = '/'.join([path, make_poolname(pools[0], seq=seq)])
+
+    start = time()
+    nbytes = 0
+    header = None
+    fd, tmp_pool = mkstemp(prefix='.', suffix='.tmp', dir=path or '.')
+    try:
+        for pool in pools:
+            with open(pool, 'rb') as fh:
+                pool_header = fh.readline()
+                if header is None:
+                    header = pool_header
+                    write(fd, header)
+                    nbytes += len(header)
+                elif pool_header != header:
+                    raise RuntimeError(
+                        'Pool "{}" header differs from "{}"'.format(pool, pools[0])
+                    )
+                nbytes += _copy_body(fh, fd, len(pool_header), fstat(fh.fileno()).st_size)
+        close(fd)
+        fd = None
+        copymode(pools[0], tmp_pool)
+        rename(tmp_pool, new_pool)
+    except Exception:
+        if fd is not None:
+            close(fd)
+        remove(tmp_pool)
+        raise
+
+    elapsed = max(time() - start, 1e-9)
+    logger.info('Combined {:d} pools into "{}": {:d} bytes, {:.1f} MB/s'.format(
+        len(pools), new_pool, nbytes, nbytes / elapsed / 1e6
+    ))
+    return new_pool
+
+
+def read_pool(pool, cache=True, mmap=False):
+    """Read a pool, using a columnar cache
+
+    The first read parses the pool with `AssociationPool.read` and saves
+    each column as a NumPy file in a sidecar folder, `.<pool>.cache`,
+    next to the pool. Later reads load the columns from there. The cache
+    is valid while the pool's size and modification time are unchanged;
+    if only the modification time changed, the content hash decides.
+
+    Parameters
+    ----------
+    pool: str
+        The pool file.
+
+    cache: bool
+        Use, and create, the cache.
+
+    mmap: bool
+        Memory-map the cached columns instead of loading them.
+
+    Returns
+    -------
+    AssociationPool
+        The pool.
+    """
+    if cache:
+        pool_table = _read_pool_cache(pool, mmap=mmap)
+        if pool_table is not None:
+            return pool_table
+
+    pool_table = AssociationPool.read(pool)
+    if cache:
+        try:
+            _write_pool_cache(pool, pool_table)
+        except (IOError, OSError) as exception:
+            logger.warning('Cannot cache pool "{}": {}'.format(pool, exception))
+    return pool_table
+
+
+def read_pool_columns(pool, colnames, delimiter='|'):
+    """Read only the specified columns from a pool file
+
+    If the pool has a valid columnar cache, see `read_pool`, the
+    columns are loaded from it. Otherwise the pool is memory-mapped
+    and only the header and the requested columns are parsed.
+
+    Parameters
+    ----------
+    pool: str
+        The pool file.
+
+    colnames: [str[,...]]
+        The columns to read.
+
+    delimiter: str
+        The column delimiter.
+
+    Returns
+    -------
+    Table
+        Table of just the requested columns.
+
+    Raises
+    ------
+    KeyError
+        A requested column is not in the pool.
+
+    ValueError
+        A row is too short to contain the requested columns.
+    """
+    from mmap import mmap, ACCESS_READ
+
+    cached = _read_pool_cache(pool, colnames=colnames)
+    if cached is not None:
+        tbl = Table()
+        for colname in colnames:
+            tbl[colname] = _typed_column(_unmasked_values(cached[colname]))
+        return tbl
+
+    delimiter = delimiter.encode()
+    with open(pool, 'rb') as fh, mmap(fh.fileno(), 0, access=ACCESS_READ) as mm:
+        lines = (
+            (lineno, line)
+            for lineno, line in enumerate(iter(mm.readline, b''), 1)
+            if line.strip() and not line.startswith(b'#')
+        )
+        header = [name.strip().decode() for name in next(lines)[1].split(delimiter)]
+        indices = []
+        for colname in colnames:
+            try:
+                indices.append(header.index(colname))
+            except ValueError:
+                raise KeyError(colname)
+        maxsplit = max(indices) + 1
+        values = [[] for _ in indices]
+        for lineno, line in lines:
+            fields = line.split(delimiter, maxsplit)
+            if len(fields) < maxsplit:
+                raise ValueError(
+                    '{}: line {:d} has {:d} columns, expected at least {:d}'.format(
+                        pool, lineno, len(fields), maxsplit
+                    )
+                )
+            for column, index in zip(values, indices):
+                column.append(fields[index].strip())
+
+    tbl = Table()
+    for colname, column in zip(colnames, values):
+        tbl[colname] = _typed_column(column)
+    return tbl
+
+
+def validate_pool(pool, required=REQUIRED_POOL_COLUMNS, key='EXPNAME', delimiter='|'):
+    """Check a pool for problems that would break association generation
+
+    The pool is read once, a line at a time; only the exposure keys
+    are kept in memory. The checks are for unnamed or duplicate
+    column names, missing required columns, rows with the wrong
+    number of columns, and duplicate exposures.
+
+    Parameters
+    ----------
+    pool: str
+        The pool file.
+
+    required: [str[,...]]
+        Columns that must be present.
+
+    key: str
+        The column identifying an exposure.
+
+    delimiter: str
+        The column delimiter.
+
+    Returns
+    -------
+    dict
+        With "valid", the header, the row count, and the problems found.
+        "bad_width_rows" are line numbers in the file.
+    """
+    from mmap import mmap, ACCESS_READ
+    import numpy as np
+
+    result = {
+        'pool': pool,
+        'valid': False,
+        'header': [],
+        'n_rows': 0,
+        'bad_header': [],
+        'missing_columns': [],
+        'bad_width_rows': [],
+        'duplicates': [],
+        'error': '',
+    }
+    sep = delimiter.encode()
+    bad_width_rows = []
+    seen = set()
+    duplicates = set()
+    try:
+        with open(pool, 'rb') as fh, mmap(fh.fileno(), 0, access=ACCESS_READ) as mm:
+            lines = (
+                (lineno, line)
+                for lineno, line in enumerate(iter(mm.readline, b''), 1)
+                if line.strip() and not line.startswith(b'#')
+            )
+            try:
+                header_line = next(lines)[1]
+            except StopIteration:
+                result['error'] = 'Empty pool'
+                return result
+
+            header = [name.strip().decode() for name in header_line.split(sep)]
+            result['header'] = header
+            names, counts = np.unique(header, return_counts=True)
+            result['bad_header'] = sorted(
+                set(str(name) for name in names[counts > 1]) | set(name for name in header if not name)
+            )
+            result['missing_columns'] = [name for name in required if name not in header]
+
+            width = len(header) - 1
+            key_index = header.index(key) if key in header else None
+            n_rows = 0
+            for lineno, line in lines:
+                n_rows += 1
+                if line.count(sep) != width:
+                    bad_width_rows.append(lineno)
+                if key_index is not None:
+                    fields = line.split(sep, key_index + 1)
+                    value = fields[key_index].strip() if len(fields) > key_index else b''
+                    if value in seen:
+                        duplicates.add(value)
+                    else:
+                        seen.add(value)
+    except (IOError, OSError, ValueError) as exception:
+        result['error'] = str(exception)
+        return result
+
+    result['n_rows'] = n_rows
+    result['bad_width_rows'] = bad_width_rows
+    result['duplicates'] = sorted(value.decode() for value in duplicates)
+
+    result['valid'] = not (
+        result['bad_header'] or result['missing_columns']
+        or result['bad_width_rows'] or result['duplicates']
+    )
+    return result
+
+
+def validate_pools(pools, required=REQUIRED_POOL_COLUMNS, key='EXPNAME', max_workers=None):
+    """Validate many pools in parallel
+
+    Parameters
+    ----------
+    pools: [str[,...]]
+        The pool files.
+
+    required, key:
+        As for `validate_pool`.
+
+    max_workers: int or None
+        Number of worker processes. If None, the number of CPUs is used.
+
+    Returns
+    -------
+    Table
+        One row per pool, in the order given, summarizing the problems.
+        "same_header" compares each pool's header to the first pool's.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+
+    pools = list(pools)
+    check = partial(validate_pool, required=required, key=key)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(check, pools, chunksize=max(1, len(pools) // 64)))
+
+    first_header = results[0]['header'] if results else []
+    summary = Table(
+        rows=[
+            (
+                result['pool'],
+                result['valid'],
+                result['header'] == first_header,
+                result['n_rows'],
+                ','.join(result['bad_header']),
+                ','.join(result['missing_columns']),
+                len(result['bad_width_rows']),
+                len(result['duplicates']),
+                result['error'],
+            )
+            for result in results
+        ],
+        names=(
+            'pool', 'valid', 'same_header', 'n_rows', 'bad_header',
+            'missing_columns', 'n_bad_width', 'n_duplicates', 'error'
+        ),
+        dtype=(str, bool, bool, int, str, str, int, int, str),
+    )
+    invalid = len(summary) - summary['valid'].sum()
+    if invalid:
+        logger.warning('{:d} of {:d} pools are invalid'.format(invalid, len(summary)))
+    return summary
 
 
 def make_poolname(existing_pool, seq='999'):
@@ -132,3 +1168,364 @@ def make_poolname(existing_pool, seq='999'):
         'pool.csv'
     ])
     return new_pool
+
+
+# Registries built by `get_registry`, keyed by rule files
+_registry_cache = {}
+
+# Per-process rules for `asngen_many`
+_worker_rules = None
+
+
+def _asngen_init():
+    """Create the rules for this worker process"""
+    global _worker_rules
+    _worker_rules = get_registry()
+
+
+def _asngen_pool(pool):
+    """Generate associations for one pool using the worker rules"""
+    from time import time
+    start = time()
+    try:
+        result = asngen(pool, rules=_worker_rules)
+    except Exception as exception:
+        logger.error('Pool "{}" failed: {}'.format(pool, exception))
+        result = exception
+    return pool, result, time() - start
+
+
+@contextmanager
+def _phase(report, name, profile=False, trace_memory=False, nstats=20):
+    """Time, and optionally profile, a phase, adding it to the report"""
+    from time import time
+
+    phase = {'phase': name}
+    started_tracing = False
+    if trace_memory:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+    if profile:
+        from cProfile import Profile
+        profiler = Profile()
+        profiler.enable()
+    start = time()
+    try:
+        yield phase
+    finally:
+        phase['time'] = time() - start
+        if profile:
+            from pstats import Stats
+            from six import StringIO
+            profiler.disable()
+            stream = StringIO()
+            Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(nstats)
+            phase['profile'] = stream.getvalue()
+        if trace_memory:
+            phase['peak_memory'] = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+        report['phases'].append(phase)
+
+
+def _asn_summary(assoc):
+    """Summarize an association"""
+    products = assoc.get('products', [])
+    return {
+        'asn_type': assoc.get('asn_type'),
+        'product_name': products[0].get('name') if products else None,
+        'n_members': sum(len(product.get('members', [])) for product in products),
+    }
+
+
+def _rename_asn_pool(assoc, old_name, new_name):
+    """Point a reused association at the pool it is now reported for"""
+    try:
+        asn_pool = assoc['asn_pool']
+    except (KeyError, TypeError):
+        return
+    if isinstance(asn_pool, str):
+        assoc['asn_pool'] = asn_pool.replace(old_name, new_name)
+
+
+def _same_asns(result, other):
+    """True if two `generate` results have the same associations and orphans"""
+    asns, orphaned = result
+    other_asns, other_orphaned = other
+    return (
+        sorted(str(assoc) for assoc in asns) ==
+        sorted(str(assoc) for assoc in other_asns) and
+        sorted(_row_hash(row) for row in orphaned) ==
+        sorted(_row_hash(row) for row in other_orphaned)
+    )
+
+
+def _fingerprint(hashes):
+    """Order-independent fingerprint of a collection of row hashes"""
+    from hashlib import sha1
+    return sha1(''.join(sorted(hashes)).encode()).hexdigest()
+
+
+def _row_hash(row):
+    """Hash of the contents of a pool row"""
+    from hashlib import sha1
+    return sha1('|'.join(str(value) for value in row).encode()).hexdigest()
+
+
+def _file_hash(path, bufsize=16 * 1024 * 1024):
+    """SHA1 hex digest of a file's contents"""
+    from hashlib import sha1
+    digest = sha1()
+    with open(path, 'rb') as fh:
+        for buf in iter(lambda: fh.read(bufsize), b''):
+            digest.update(buf)
+    return digest.hexdigest()
+
+
+def _pool_cache_dir(pool):
+    """Folder holding the columnar cache of a pool"""
+    from os.path import basename, dirname, join
+    return join(dirname(pool), '.' + basename(pool) + '.cache')
+
+
+def _read_pool_cache(pool, colnames=None, mmap=False):
+    """Load a pool from its columnar cache
+
+    Returns None if there is no valid cache.
+    """
+    import json
+    from os import stat
+    from os.path import join
+    import numpy as np
+    from astropy.table import MaskedColumn
+
+    cache_dir = _pool_cache_dir(pool)
+    try:
+        with open(join(cache_dir, 'meta.json')) as fh:
+            meta = json.load(fh)
+        pool_stat = stat(pool)
+    except (IOError, OSError, ValueError):
+        return None
+    if pool_stat.st_size != meta['size']:
+        return None
+    if pool_stat.st_mtime != meta['mtime']:
+        if _file_hash(pool) != meta['sha1']:
+            return None
+        meta['mtime'] = pool_stat.st_mtime
+        try:
+            with open(join(cache_dir, 'meta.json'), 'w') as fh:
+                json.dump(meta, fh)
+        except (IOError, OSError):
+            pass
+
+    columns = meta['columns']
+    if colnames is not None:
+        by_name = {column['name']: column for column in columns}
+        try:
+            columns = [by_name[colname] for colname in colnames]
+        except KeyError as exception:
+            raise KeyError(exception.args[0])
+
+    mmap_mode = 'r' if mmap else None
+    pool_table = AssociationPool()
+    for column in columns:
+        data = np.load(join(cache_dir, column['file']), mmap_mode=mmap_mode)
+        if column['mask'] is not None:
+            mask = np.load(join(cache_dir, column['mask']), mmap_mode=mmap_mode)
+            data = MaskedColumn(data, mask=mask)
+        pool_table[column['name']] = data
+    pool_table.meta.update(meta.get('table_meta', {}))
+    # As `AssociationPool.read` would set it for this read; the rules
+    # take the association's pool name from it.
+    pool_table.meta['pool_file'] = pool
+    return pool_table
+
+
+def _write_pool_cache(pool, pool_table):
+    """Save a pool's columns as a columnar cache"""
+    import json
+    from os import rename, stat
+    from os.path import basename, dirname, exists, join
+    from shutil import rmtree
+    from tempfile import mkdtemp
+    import numpy as np
+
+    pool_stat = stat(pool)
+    meta = {
+        'size': pool_stat.st_size,
+        'mtime': pool_stat.st_mtime,
+        'sha1': _file_hash(pool),
+        'table_meta': json.loads(json.dumps(dict(pool_table.meta), default=str)),
+        'columns': [],
+    }
+    cache_dir = _pool_cache_dir(pool)
+    tmp_dir = mkdtemp(dir=dirname(cache_dir) or '.', prefix=basename(cache_dir) + '.')
+    try:
+        for idx, name in enumerate(pool_table.colnames):
+            column = pool_table[name]
+            entry = {'name': name, 'file': '{:d}.npy'.format(idx), 'mask': None}
+            data = np.asarray(column)
+            mask = getattr(column, 'mask', None)
+            if mask is not None and np.any(mask):
+                entry['mask'] = '{:d}.mask.npy'.format(idx)
+                np.save(join(tmp_dir, entry['mask']), np.asarray(mask))
+                data = np.asarray(column.filled())
+            if data.dtype == object:
+                data = data.astype(str)
+            np.save(join(tmp_dir, entry['file']), data)
+            meta['columns'].append(entry)
+        with open(join(tmp_dir, 'meta.json'), 'w') as fh:
+            json.dump(meta, fh)
+        if exists(cache_dir):
+            rmtree(cache_dir)
+        rename(tmp_dir, cache_dir)
+    except Exception:
+        rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def _pool_header(pool, delimiter='|'):
+    """Column names of a pool"""
+    with open(pool, 'rb') as fh:
+        for line in fh:
+            if line.strip() and not line.startswith(b'#'):
+                return [name.strip().decode() for name in line.split(delimiter.encode())]
+    return []
+
+
+def _pool_row_hashes(pool, header, columns, key, delimiter='|'):
+    """Yield key value and hash of the given columns for each row
+
+    Raises ValueError for rows of the wrong width and repeated keys.
+    """
+    delimiter = delimiter.encode()
+    key_index = header.index(key)
+    indices = [header.index(name) for name in columns]
+    seen = set()
+    with open(pool, 'rb') as fh:
+        lines = (
+            (lineno, line) for lineno, line in enumerate(fh, 1)
+            if line.strip() and not line.startswith(b'#')
+        )
+        next(lines)
+        for lineno, line in lines:
+            fields = [field.strip() for field in line.split(delimiter)]
+            if len(fields) != len(header):
+                raise ValueError(
+                    '{}: line {:d} has {:d} columns, expected {:d}'.format(
+                        pool, lineno, len(fields), len(header)
+                    )
+                )
+            exposure = fields[key_index].decode()
+            if exposure in seen:
+                raise ValueError(
+                    '{}: line {:d} repeats {} "{}"'.format(pool, lineno, key, exposure)
+                )
+            seen.add(exposure)
+            yield (
+                exposure,
+                hash(b'|'.join([fields[index] for index in indices]))
+            )
+
+
+def _unmasked_values(column):
+    """Values of a cached column, with masked entries as empty strings
+
+    This matches what `read_pool_columns` parses from the pool file
+    itself, where a missing value is an empty field.
+    """
+    import numpy as np
+
+    mask = getattr(column, 'mask', None)
+    if mask is not None and np.any(mask):
+        return np.where(mask, '', np.asarray(column.data).astype(str))
+    return np.asarray(column)
+
+
+def _typed_column(values):
+    """Convert list of bytes to an int, float or str array"""
+    import numpy as np
+
+    column = np.array(values)
+    for dtype in (int, float):
+        try:
+            return column.astype(dtype)
+        except ValueError:
+            pass
+    return column.astype(str)
+
+
+def _rule_files_key(definition_files=None):
+    """Key of paths and modification times of the rule files"""
+    from glob import glob
+    from os.path import dirname, getmtime
+    from jwst.associations.lib import rules_level3
+
+    paths = glob(dirname(rules_level3.__file__) + '/rules_*.py')
+    if definition_files is not None:
+        paths.extend(python_path(path) for path in definition_files)
+    return tuple(
+        (path, getmtime(path))
+        for path in sorted(set(paths))
+    )
+
+
+def _copy_body(fh, fd, offset, size, bufsize=16 * 1024 * 1024):
+    """Copy file contents from offset to end onto a file descriptor
+
+    Uses `os.sendfile` when available, else large buffered reads.
+    Returns the number of bytes copied.
+    """
+    import os
+
+    count = size - offset
+    if hasattr(os, 'sendfile'):
+        try:
+            copied = 0
+            while copied < count:
+                sent = os.sendfile(fd, fh.fileno(), offset + copied, count - copied)
+                if sent == 0:
+                    break
+                copied += sent
+            return copied
+        except OSError:
+            if copied:
+                raise
+    fh.seek(offset)
+    copied = 0
+    while True:
+        buf = fh.read(bufsize)
+        if not buf:
+            break
+        os.write(fd, buf)
+        copied += len(buf)
+    return copied
+
+
+def arguments():
+    """Parse and return command line arguments.
+    """
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Show the exposures that differ between two pools.',
+        epilog='example: pool_tools.py jw98765_001_..._pool.csv jw98765_002_..._pool.csv')
+    parser.add_argument('old_pool', help='Original pool')
+    parser.add_argument('new_pool', help='Changed pool')
+    parser.add_argument('--key', default='EXPNAME',
+            help='Column identifying an exposure')
+    return parser.parse_args()
+
+
+def main():
+    args = arguments()
+    diff = pool_diff(args.old_pool, args.new_pool, key=args.key)
+    for name, values in diff.items():
+        print('{} ({:d}):'.format(name, len(values)))
+        for value in values:
+            print('    {}'.format(value))
+
+
+if __name__ == '__main__':
+    main()
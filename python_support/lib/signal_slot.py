@@ -12,66 +12,1248 @@ License: MIT
 """
 from __future__ import print_function
 import six
+from collections import deque
+from contextlib import contextmanager
 import inspect
+import logging
 import warnings
-from weakref import WeakSet, WeakKeyDictionary
+from itertools import count
+from weakref import WeakKeyDictionary, ref
+
+logger = logging.getLogger(__name__)
+
+# Dispatch policies
+DIRECT = 'direct'
+QUEUED = 'queued'
+POOLED = 'pooled'
+
+# Returned by a slot to stop the emit reaching further slots
+STOP = object()
+
+# Connection order, to keep equal priorities in order
+_connections = count()
 
-from debug import msg_debug
 
 class Signal(object):
-    def __init__(self):
-        self._functions = WeakSet()
+    """A signal that slots can be connected to
+
+    Parameters
+    ----------
+    dispatch: str
+        How slots are called on emit:
+        DIRECT calls them in the emitting thread;
+        QUEUED hands the emit to a worker thread which calls them in order;
+        POOLED calls each slot on a thread pool.
+
+    maxsize: int
+        For QUEUED and POOLED, the most emits, or slot calls, waiting to
+        be done. Emitting blocks while full. 0 is unbounded.
+
+    worker: SignalWorker or None
+        For QUEUED, the worker to use, which may be shared between
+        signals. If None, the signal gets its own, which is stopped
+        when the signal is garbage collected.
+
+    executor: concurrent.futures.Executor or None
+        For POOLED, the executor to use. If None, a shared
+        ThreadPoolExecutor is used.
+
+    debounce: float or None
+        Hold emits until none have been made for this many seconds,
+        then emit once with the arguments of the last.
+
+    throttle: float or None
+        Emit at most once in this many seconds. An emit inside the
+        window is held and made, with the arguments of the last,
+        when the window ends.
+
+    Debounced and throttled emits are made from a timer thread.
+
+    readonly: bool
+        Pass buffer arguments to slots as read-only views, see `readonly`.
+        All slots share the one view; nothing is copied.
+
+    freeze: bool
+        With `readonly`, also make the emitted NumPy arrays themselves
+        read-only, so the emitter cannot change data slots still hold.
+
+    Attributes
+    ----------
+    metrics: dict
+        For QUEUED and POOLED, the number of emits and slot calls,
+        the total seconds spent in slots, and the most emits, or
+        slot calls, that were pending at once.
+    """
+
+    def __init__(self, dispatch=DIRECT, maxsize=0, worker=None, executor=None,
+                 debounce=None, throttle=None, readonly=False, freeze=False):
+        from threading import Lock, RLock
+
+        # Connected slots and their (priority, predicate, key, order)
+        self._functions = WeakKeyDictionary()
         self._methods = WeakKeyDictionary()
 
+        # Snapshot of the receivers, built on first emit after a change.
+        # Emits read the snapshot without locking; all changes to the
+        # connections, and rebuilding the snapshot, hold the lock.
+        self._receivers = None
+        self._lock = RLock()
+
+        if dispatch not in (DIRECT, QUEUED, POOLED):
+            raise ValueError('Unknown dispatch "{}"'.format(dispatch))
+        self.dispatch = dispatch
+        self.metrics = {
+            'emits': 0,
+            'slot_calls': 0,
+            'slot_time': 0.,
+            'max_pending': 0,
+        }
+        self._metrics_lock = Lock()
+        if dispatch == QUEUED:
+            if worker is None:
+                from weakref import finalize
+                worker = SignalWorker(maxsize)
+                finalize(self, worker.stop, False)
+            self._worker = worker
+        elif dispatch == POOLED:
+            from threading import BoundedSemaphore
+            self._executor = executor if executor is not None else _default_executor()
+            self._pending = set()
+            self._pending_lock = Lock()
+            self._slots_free = BoundedSemaphore(maxsize) if maxsize else None
+
+        # Emits held by `batch`, `debounce` or `throttle`
+        self._debounce = debounce
+        self._throttle = throttle
+        self._batch_depth = 0
+        self._batched = None
+        self._batch_collect = False
+        self._latest = None
+        self._timer = None
+        self._deadline = 0.
+        self._last_fire = 0.
+        self._hold = bool(debounce or throttle)
+
+        # Instrumentation, see `instrument`; None when disabled.
+        self._stats = None
+
+        self.readonly = readonly
+        self.freeze = freeze
+
     def __call__(self, *args, **kargs):
-        # Call handler functions
-        to_be_removed = []
-        for func in self._functions.copy():
-            try:
-                func(*args, **kargs)
-            except RuntimeError:
-                Warning.warn('Signals func->RuntimeError: func "{}" will be removed.'.format(func))
-                to_be_removed.append(func)
-
-        for remove in to_be_removed:
-            self._functions.discard(remove)
-
-        # Call handler methods
-        to_be_removed = []
-        emitters = self._methods.copy()
-        for obj, funcs in emitters.items():
-            msg_debug('obj is type "{}"'.format(type(obj)))
-            for func in funcs.copy():
+        if self.readonly:
+            args, kargs = _readonly_args(args, kargs, self.freeze)
+        if self._hold:
+            self._hold_emit(args, kargs)
+        elif self.dispatch == DIRECT:
+            self._emit(args, kargs)
+        else:
+            self._deliver(args, kargs)
+
+    @property
+    def debounce(self):
+        """Seconds to hold emits until none have been made, or None"""
+        return self._debounce
+
+    @debounce.setter
+    def debounce(self, value):
+        with self._lock:
+            self._debounce = value
+            self._hold = bool(self._batch_depth or value or self._throttle)
+
+    @property
+    def throttle(self):
+        """Least seconds between emits, or None"""
+        return self._throttle
+
+    @throttle.setter
+    def throttle(self, value):
+        with self._lock:
+            self._throttle = value
+            self._hold = bool(self._batch_depth or self._debounce or value)
+
+    @contextmanager
+    def batch(self, collect=False):
+        """Hold emits made in the block, then emit once at its end
+
+        Batches may be nested; the emit is made when the outermost
+        ends. No emit is made if there were none in the block.
+        Emits from all threads are held while the block is active.
+
+        Parameters
+        ----------
+        collect: bool
+            If False, emit with the arguments of the last emit.
+            If True, emit with one argument: the list of
+            (args, kargs) of every emit held.
+        """
+        with self._lock:
+            self._batch_depth += 1
+            if self._batch_depth == 1:
+                self._batched = []
+                self._batch_collect = collect
+            self._hold = True
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                batched = None
+                if self._batch_depth == 0:
+                    batched = self._batched
+                    self._batched = None
+                    self._hold = bool(self.debounce or self.throttle)
+            if batched:
+                if self._batch_collect:
+                    self._deliver((batched,), {})
+                else:
+                    self._deliver(*batched[-1])
+
+    @contextmanager
+    def instrument(self, slow=None, nsamples=1000):
+        """Record emit and slot statistics within the block
+
+        Yields the `SignalStats`, which remain readable afterwards.
+        See `start_stats` for the parameters.
+        """
+        stats = self.start_stats(slow=slow, nsamples=nsamples)
+        try:
+            yield stats
+        finally:
+            self.stop_stats()
+
+    def start_stats(self, slow=None, nsamples=1000):
+        """Start recording emit and slot statistics
+
+        Parameters
+        ----------
+        slow: float or None
+            Warn when a slot call takes longer than this many seconds.
+
+        nsamples: int
+            Number of recent call times kept per slot for percentiles.
+
+        Returns
+        -------
+        SignalStats
+            The statistics being recorded.
+        """
+        self._stats = SignalStats(slow=slow, nsamples=nsamples)
+        return self._stats
+
+    def stop_stats(self):
+        """Stop recording statistics, returning the last snapshot"""
+        stats = self._stats
+        self._stats = None
+        if stats is not None:
+            return stats.snapshot()
+
+    def stats(self):
+        """Snapshot of the statistics being recorded, or None"""
+        stats = self._stats
+        if stats is not None:
+            return stats.snapshot()
+
+    def flush(self):
+        """Make any debounced or throttled emit now"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self._fire()
+
+    def join(self):
+        """Wait for all queued or pooled slot calls to finish"""
+        if self.dispatch == QUEUED:
+            self._worker.join()
+        elif self.dispatch == POOLED:
+            from concurrent.futures import wait
+            with self._pending_lock:
+                pending = list(self._pending)
+            wait(pending)
+
+    def pending(self):
+        """Number of emits, or slot calls, waiting to be done"""
+        if self.dispatch == QUEUED:
+            return self._worker.queue.qsize()
+        elif self.dispatch == POOLED:
+            return len(self._pending)
+        return 0
+
+    def _deliver(self, args, kargs, topic=None):
+        """Emit according to the dispatch policy"""
+        if self.dispatch == DIRECT:
+            self._emit(args, kargs, topic)
+        elif self.dispatch == QUEUED:
+            self._worker.put(self, args, kargs, topic)
+        else:
+            self._emit_pooled(args, kargs, topic)
+
+    def _hold_emit(self, args, kargs):
+        """Hold an emit for a batch, debounce or throttle
+
+        The hold state is read again under the lock, since a batch may
+        have ended, or debounce and throttle been changed, since the
+        caller checked. If nothing holds the emit any more it is made
+        straight away.
+        """
+        from time import time
+
+        fire_now = False
+        with self._lock:
+            debounce = self.debounce
+            throttle = self.throttle
+            if self._batch_depth:
+                self._batched.append((args, kargs))
+                return
+            if not (debounce or throttle):
+                fire_now = None
+            else:
+                self._latest = (args, kargs)
+                now = time()
+                if debounce:
+                    # One timer per quiet period: emits just move the
+                    # deadline, and the timer re-arms until it passes.
+                    self._deadline = now + debounce
+                    if self._timer is None:
+                        self._start_timer(debounce)
+                elif self._timer is None:
+                    wait = throttle - (now - self._last_fire)
+                    if wait <= 0:
+                        fire_now = True
+                    else:
+                        self._start_timer(wait)
+        if fire_now is None:
+            self._deliver(args, kargs)
+        elif fire_now:
+            self._fire()
+
+    def _start_timer(self, wait):
+        """Start the timer for a held emit; call with the lock held"""
+        from threading import Timer
+        self._timer = Timer(wait, self._expire)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _expire(self):
+        """Timer callback: fire, or re-arm if the debounce deadline moved"""
+        from threading import current_thread
+        from time import time
+        with self._lock:
+            if self._timer is not current_thread():
+                # Flushed, and maybe replaced, meanwhile
+                return
+            if self.debounce:
+                wait = self._deadline - time()
+                if wait > 0:
+                    self._start_timer(wait)
+                    return
+        self._fire()
+
+    def _fire(self):
+        """Make the held emit"""
+        from time import time
+        with self._lock:
+            latest = self._latest
+            self._latest = None
+            self._timer = None
+            self._last_fire = time()
+        if latest is not None:
+            self._deliver(*latest)
+
+    def _emit(self, args, kargs, topic=None):
+        """Call the slots in the current thread, in priority order
+
+        Returns the number of slots called.
+        """
+        if self._stats is not None:
+            return self._emit_instrumented(args, kargs, topic)
+        entries, by_topic = self._get_receivers()
+        if topic is not None:
+            entries = by_topic.get(topic, entries)
+        ncalls = 0
+        debug = logger.isEnabledFor(logging.DEBUG)
+
+        for func, obj_ref, predicate in entries:
+            if obj_ref is None:
+                # Handler function
+                func = func()
+                if func is None:
+                    self._receivers = None
+                    continue
+                if predicate is not None and not predicate(*args, **kargs):
+                    continue
+                ncalls += 1
                 try:
-                    func(obj, *args, **kargs)
+                    result = func(*args, **kargs)
+                except RuntimeError:
+                    warnings.warn('Signals func->RuntimeError: func "{}" will be removed.'.format(func))
+                    with self._lock:
+                        self._functions.pop(func, None)
+                        self._receivers = None
+                    continue
+            else:
+                # Handler method
+                obj = obj_ref()
+                if obj is None:
+                    self._receivers = None
+                    continue
+                if predicate is not None and not predicate(*args, **kargs):
+                    continue
+                if debug:
+                    logger.debug('obj is type "%s"', type(obj))
+                ncalls += 1
+                try:
+                    result = func(obj, *args, **kargs)
                 except RuntimeError:
                     warnings.warn('Signals methods->RuntimeError, obj.func "{}.{}" will be removed'.format(obj, func))
-                    to_be_removed.append((obj, func))
+                    with self._lock:
+                        self._methods.get(obj, {}).pop(func, None)
+                        self._receivers = None
+                    continue
+            if result is STOP:
+                break
+        return ncalls
 
-        for obj, func in to_be_removed:
-            self._methods[obj].discard(func)
+    def connect(self, slot, priority=0, predicate=None, key=None):
+        """Connect a slot
 
-    def connect(self, slot):
-        if inspect.ismethod(slot):
-            if slot.__self__ not in self._methods:
-                self._methods[slot.__self__] = set()
+        Connecting an already connected slot replaces its options.
 
-            self._methods[slot.__self__].add(slot.__func__)
+        Parameters
+        ----------
+        slot: callable
+            Function or bound method. Only a weak reference is kept.
+            If it returns `STOP`, no further slots are called for that
+            emit; this is only meaningful for DIRECT and QUEUED dispatch.
 
-        else:
-            self._functions.add(slot)
+        priority: int
+            Slots with higher priority are called first.
+            Equal priorities are called in connection order.
+
+        predicate: callable or None
+            Called with the emit arguments; the slot is only called
+            if it returns True.
+
+        key: hashable or None
+            If given, the slot only receives emits made with
+            `emit_topic` for this key.
+        """
+        options = (priority, predicate, key, next(_connections))
+        with self._lock:
+            if inspect.ismethod(slot):
+                if slot.__self__ not in self._methods:
+                    self._methods[slot.__self__] = {}
+
+                self._methods[slot.__self__][slot.__func__] = options
+
+            else:
+                self._functions[slot] = options
+            self._receivers = None
 
     def disconnect(self, slot):
-        if inspect.ismethod(slot):
-            if slot.__self__ in self._methods:
-                self._methods[slot.__self__].remove(slot.__func__)
-        else:
-            if slot in self._functions:
-                self._functions.remove(slot)
+        with self._lock:
+            if inspect.ismethod(slot):
+                if slot.__self__ in self._methods:
+                    del self._methods[slot.__self__][slot.__func__]
+            else:
+                if slot in self._functions:
+                    del self._functions[slot]
+            self._receivers = None
 
     def clear(self):
-        self._functions.clear()
-        self._methods.clear()
+        with self._lock:
+            self._functions.clear()
+            self._methods.clear()
+            self._receivers = None
+
+    def emit_topic(self, topic, *args, **kargs):
+        """Emit to the slots connected with this key, and those with none
+
+        Topic emits are not held by `batch`, `debounce` or `throttle`.
+        """
+        if self.readonly:
+            args, kargs = _readonly_args(args, kargs, self.freeze)
+        self._deliver(args, kargs, topic)
+
+    def _emit_instrumented(self, args, kargs, topic=None):
+        """As `_emit`, timing each slot call"""
+        from time import perf_counter
+
+        stats = self._stats
+        stats.emit()
+        ncalls = 0
+        for slot in self._slots(args, kargs, topic):
+            ncalls += 1
+            start = perf_counter()
+            try:
+                result = slot(*args, **kargs)
+            except RuntimeError:
+                warnings.warn('Signals slot->RuntimeError: slot "{}" will be removed.'.format(slot))
+                self.disconnect(slot)
+                result = None
+            finally:
+                stats.call(slot, perf_counter() - start)
+            if result is STOP:
+                break
+        return ncalls
+
+    def _emit_pooled(self, args, kargs, topic=None):
+        """Submit each slot to the executor"""
+        with self._metrics_lock:
+            self.metrics['emits'] += 1
+        if self._stats is not None:
+            self._stats.emit()
+        for slot in self._slots(args, kargs, topic):
+            if self._slots_free is not None:
+                self._slots_free.acquire()
+            future = self._executor.submit(self._call_timed, slot, args, kargs)
+            with self._pending_lock:
+                self._pending.add(future)
+                npending = len(self._pending)
+            with self._metrics_lock:
+                self.metrics['max_pending'] = max(self.metrics['max_pending'], npending)
+            future.add_done_callback(self._pooled_done)
+
+    def _pooled_done(self, future):
+        with self._pending_lock:
+            self._pending.discard(future)
+        if self._slots_free is not None:
+            self._slots_free.release()
+
+    def _call_timed(self, slot, args, kargs):
+        """Call one slot, recording its time"""
+        from time import perf_counter
+        start = perf_counter()
+        try:
+            slot(*args, **kargs)
+        except RuntimeError:
+            warnings.warn('Signals slot->RuntimeError: slot "{}" will be removed.'.format(slot))
+            self.disconnect(slot)
+        except Exception:
+            logger.exception('Signals slot "{}" failed'.format(slot))
+        finally:
+            elapsed = perf_counter() - start
+            with self._metrics_lock:
+                self.metrics['slot_calls'] += 1
+                self.metrics['slot_time'] += elapsed
+            stats = self._stats
+            if stats is not None:
+                stats.call(slot, elapsed)
+
+    def _slots(self, args=(), kargs=None, topic=None):
+        """Yield each live slot as a callable, from the snapshot
+
+        Slots are in priority order and filtered by topic and predicate.
+        """
+        if kargs is None:
+            kargs = {}
+        entries, by_topic = self._get_receivers()
+        if topic is not None:
+            entries = by_topic.get(topic, entries)
+        for func, obj_ref, predicate in entries:
+            if obj_ref is None:
+                func = func()
+                if func is None:
+                    self._receivers = None
+                    continue
+            else:
+                obj = obj_ref()
+                if obj is None:
+                    self._receivers = None
+                    continue
+                func = func.__get__(obj, type(obj))
+            if predicate is None or predicate(*args, **kargs):
+                yield func
+
+    def _get_receivers(self):
+        """Return the snapshot of receivers, rebuilding if needed
+
+        The snapshot is the tuple of (function, object, predicate) for
+        the slots without a key, in call order, and a dict of the same
+        for each key, merged with the slots without one. For functions,
+        the function is a weak reference and the object None; for
+        methods, the object is a weak reference. A dead reference found
+        during emit marks the snapshot for rebuilding.
+        """
+        receivers = self._receivers
+        if receivers is None:
+            with self._lock:
+                receivers = self._receivers
+                if receivers is None:
+                    connections = [
+                        (options, (ref(func), None, options[1]))
+                        for func, options in list(self._functions.items())
+                    ]
+                    for obj, funcs in list(self._methods.items()):
+                        obj_ref = ref(obj)
+                        connections.extend(
+                            (options, (func, obj_ref, options[1]))
+                            for func, options in funcs.items()
+                        )
+                    connections.sort(key=lambda item: (-item[0][0], item[0][3]))
+                    entries = tuple(
+                        entry for options, entry in connections
+                        if options[2] is None
+                    )
+                    topics = set(
+                        options[2] for options, entry in connections
+                        if options[2] is not None
+                    )
+                    by_topic = {
+                        topic: tuple(
+                            entry for options, entry in connections
+                            if options[2] is None or options[2] == topic
+                        )
+                        for topic in topics
+                    }
+                    receivers = (entries, by_topic)
+                    self._receivers = receivers
+        return receivers
+
+
+class SignalStats(object):
+    """Emit and slot call statistics of a Signal
+
+    Parameters
+    ----------
+    slow: float or None
+        Warn when a slot call takes longer than this many seconds.
+
+    nsamples: int
+        Number of recent call times kept per slot for percentiles.
+    """
+
+    def __init__(self, slow=None, nsamples=1000):
+        from threading import Lock
+
+        self.slow = slow
+        self.nsamples = nsamples
+        self.emits = 0
+        self.slots = {}
+        self._lock = Lock()
+
+    def emit(self):
+        with self._lock:
+            self.emits += 1
+
+    def call(self, slot, elapsed):
+        """Record a slot call"""
+        name = _slot_name(slot)
+        with self._lock:
+            try:
+                slot_stats = self.slots[name]
+            except KeyError:
+                slot_stats = self.slots[name] = {
+                    'calls': 0,
+                    'total_time': 0.,
+                    'max_time': 0.,
+                    'samples': deque(maxlen=self.nsamples),
+                }
+            slot_stats['calls'] += 1
+            slot_stats['total_time'] += elapsed
+            slot_stats['max_time'] = max(slot_stats['max_time'], elapsed)
+            slot_stats['samples'].append(elapsed)
+        if self.slow is not None and elapsed > self.slow:
+            warnings.warn('Signals slow slot "{}": {:.6f}s'.format(name, elapsed))
+
+    def snapshot(self):
+        """The statistics as a dict
+
+        Per slot, by qualified name: calls, total, mean,
+        99th percentile and maximum time, in seconds.
+        """
+        with self._lock:
+            slots = {}
+            for name, slot_stats in self.slots.items():
+                samples = sorted(slot_stats['samples'])
+                slots[name] = {
+                    'calls': slot_stats['calls'],
+                    'total_time': slot_stats['total_time'],
+                    'mean_time': slot_stats['total_time'] / slot_stats['calls'],
+                    'p99_time': samples[min(len(samples) - 1, int(0.99 * len(samples)))],
+                    'max_time': slot_stats['max_time'],
+                }
+            return {'emits': self.emits, 'slots': slots}
+
+
+def _slot_name(slot):
+    """Qualified name of a slot"""
+    func = getattr(slot, '__func__', slot)
+    return '{}.{}'.format(
+        getattr(func, '__module__', None),
+        getattr(func, '__qualname__', getattr(func, '__name__', repr(func)))
+    )
+
+
+class SignalWorker(object):
+    """A thread delivering queued signal emits, in the order emitted
+
+    Parameters
+    ----------
+    maxsize: int
+        The most emits waiting to be delivered. Emitting blocks
+        while full. 0 is unbounded.
+
+    name: str or None
+        Name of the thread.
+    """
+
+    def __init__(self, maxsize=0, name=None):
+        from threading import Thread
+        from six.moves.queue import Queue
+
+        self.queue = Queue(maxsize)
+        self._thread = Thread(target=self._run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def put(self, signal, args, kargs, topic=None):
+        """Queue an emit of the signal"""
+        self.queue.put((signal, args, kargs, topic))
+        npending = self.queue.qsize()
+        with signal._metrics_lock:
+            metrics = signal.metrics
+            metrics['emits'] += 1
+            metrics['max_pending'] = max(metrics['max_pending'], npending)
+
+    def join(self):
+        """Wait until all queued emits are delivered"""
+        self.queue.join()
+
+    def stop(self, wait=True):
+        """Deliver the queued emits, then end the thread
+
+        Parameters
+        ----------
+        wait: bool
+            Wait for the thread to end.
+        """
+        self.queue.put(None)
+        if wait:
+            self._thread.join()
+
+    def _run(self):
+        from time import perf_counter
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    break
+                signal, args, kargs, topic = item
+                start = perf_counter()
+                ncalls = 0
+                try:
+                    ncalls = signal._emit(args, kargs, topic)
+                except Exception:
+                    logger.exception('Signals emit of "{}" failed'.format(signal))
+                elapsed = perf_counter() - start
+                with signal._metrics_lock:
+                    metrics = signal.metrics
+                    metrics['slot_calls'] += ncalls
+                    metrics['slot_time'] += elapsed
+            finally:
+                # Drop the references while waiting, so the
+                # signal can be collected and stop its own worker
+                item = signal = args = kargs = None
+                self.queue.task_done()
+
+
+class AsyncSignal(Signal):
+    """A Signal whose slots may be coroutine functions
+
+    Emit with `await signal(...)`. All slots run concurrently via
+    `asyncio.gather`; plain functions and methods are called directly.
+    Slots are held by weak reference exactly as for `Signal`.
+    `instrument` records the time to complete each slot. Emits cannot
+    be held: `batch`, `debounce` and `throttle` raise TypeError.
+
+    Parameters
+    ----------
+    max_concurrency: int or None
+        Most coroutine slots to run at once. None is no limit.
+
+    timeout: float or None
+        Seconds to allow each coroutine slot. None is no limit.
+
+    readonly, freeze: bool
+        As for `Signal`.
+    """
+
+    def __init__(self, max_concurrency=None, timeout=None, readonly=False, freeze=False):
+        super(AsyncSignal, self).__init__(readonly=readonly, freeze=freeze)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+
+    @property
+    def debounce(self):
+        return None
+
+    @debounce.setter
+    def debounce(self, value):
+        if value:
+            raise TypeError('AsyncSignal emits cannot be debounced')
+
+    @property
+    def throttle(self):
+        return None
+
+    @throttle.setter
+    def throttle(self, value):
+        if value:
+            raise TypeError('AsyncSignal emits cannot be throttled')
+
+    def batch(self, collect=False):
+        raise TypeError('AsyncSignal emits cannot be batched')
+
+    async def __call__(self, *args, **kargs):
+        """Emit to all slots
+
+        Returns
+        -------
+        list
+            The result of each slot. A slot that raised or
+            timed out gives its exception.
+        """
+        return await self._emit_async(args, kargs)
+
+    async def emit_topic(self, topic, *args, **kargs):
+        """Emit to the slots connected with this key, and those with none
+
+        Emit with `await signal.emit_topic(topic, ...)`.
+        Returns as for calling the signal.
+        """
+        return await self._emit_async(args, kargs, topic)
+
+    async def _emit_async(self, args, kargs, topic=None):
+        """Run the slots concurrently, gathering their results"""
+        import asyncio
+
+        if self.readonly:
+            args, kargs = _readonly_args(args, kargs, self.freeze)
+        stats = self._stats
+        if stats is not None:
+            stats.emit()
+        semaphore = None
+        if self.max_concurrency:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await asyncio.gather(
+            *[
+                self._call_slot(slot, semaphore, args, kargs)
+                for slot in self._slots(args, kargs, topic)
+            ],
+            return_exceptions=True
+        )
+
+    async def _call_slot(self, slot, semaphore, args, kargs):
+        import asyncio
+
+        try:
+            if semaphore is None or not inspect.iscoroutinefunction(slot):
+                return await self._call_timed_async(slot, args, kargs)
+            async with semaphore:
+                return await self._call_timed_async(slot, args, kargs)
+        except asyncio.TimeoutError:
+            warnings.warn('Signals slot "{}" timed out after {}s'.format(slot, self.timeout))
+            raise
+        except RuntimeError:
+            warnings.warn('Signals slot->RuntimeError: slot "{}" will be removed.'.format(slot))
+            self.disconnect(slot)
+            raise
+
+    async def _call_timed_async(self, slot, args, kargs):
+        """Call, or await, one slot, recording its time if instrumented"""
+        import asyncio
+        from time import perf_counter
+
+        start = perf_counter()
+        try:
+            if not inspect.iscoroutinefunction(slot):
+                return slot(*args, **kargs)
+            return await asyncio.wait_for(slot(*args, **kargs), self.timeout)
+        finally:
+            stats = self._stats
+            if stats is not None:
+                stats.call(slot, perf_counter() - start)
+
+
+class SignalPublisher(object):
+    """Forward the emits of a Signal to other processes
+
+    Emit arguments are pickled with protocol 5, keeping large buffers,
+    such as NumPy arrays, out-of-band so they are written straight from
+    their memory. Subscribers keep their connection open, so there is
+    no setup per emit.
+
+    The publisher connects itself to the signal by weak reference;
+    keep a reference to it for as long as it should publish.
+
+    Parameters
+    ----------
+    signal: Signal
+        The signal whose emits are published.
+
+    address: str or None
+        Path of a Unix socket to accept `SignalSubscriber` connections on.
+        A socket file left by a publisher that is no longer running
+        is removed.
+
+    queues: [multiprocessing.Queue[,...]] or None
+        Queues to put emits on, one for each `SignalSubscriber`
+        reading a queue.
+
+    send_timeout: float or None
+        Seconds to allow sending an emit to a socket subscriber.
+        A subscriber that does not keep up is disconnected.
+        None waits forever.
+    """
+
+    def __init__(self, signal, address=None, queues=None, send_timeout=1.0):
+        import socket
+        from threading import Lock, Thread
+
+        self.signal = signal
+        self.address = address
+        self.queues = list(queues or [])
+        self.send_timeout = send_timeout
+        self._clients = []
+        self._lock = Lock()
+        self._server = None
+        if address is not None:
+            _remove_stale_socket(address)
+            self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._server.bind(address)
+            self._server.listen(16)
+            thread = Thread(target=self._accept)
+            thread.daemon = True
+            thread.start()
+        signal.connect(self.publish)
+
+    def close(self):
+        """Stop publishing, disconnecting all subscribers"""
+        import os
+        import socket
+
+        self.signal.disconnect(self.publish)
+        for queue in self.queues:
+            queue.put(None)
+        with self._lock:
+            for client in self._clients:
+                client.close()
+            self._clients = []
+        if self._server is not None:
+            # Shutdown wakes the accept thread; close alone does not
+            try:
+                self._server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._server.close()
+            try:
+                os.unlink(self.address)
+            except OSError:
+                pass
+            self._server = None
+
+    def publish(self, *args, **kargs):
+        """Send an emit to all subscribers"""
+        frames = _dumps(args, kargs)
+        for queue in self.queues:
+            queue.put([bytes(frame) for frame in frames])
+        with self._lock:
+            for client in list(self._clients):
+                try:
+                    _send_frames(client, frames)
+                except OSError as exception:
+                    logger.warning('Signals publisher dropping subscriber: {}'.format(exception))
+                    self._clients.remove(client)
+                    client.close()
+
+    def _accept(self):
+        server = self._server
+        while True:
+            try:
+                client, _ = server.accept()
+            except OSError:
+                break
+            client.settimeout(self.send_timeout)
+            with self._lock:
+                self._clients.append(client)
+
+
+class SignalSubscriber(object):
+    """Emit, on a local Signal, the emits of a `SignalPublisher`
+
+    Emits are received on one background thread and the local signal
+    is emitted from another, so slow slots do not stop the subscriber
+    reading from the publisher. Received emits wait, unbounded, until
+    the slots are ready for them.
+
+    Parameters
+    ----------
+    signal: Signal
+        The local signal to emit.
+
+    address: str or None
+        Path of the publisher's Unix socket.
+
+    queue: multiprocessing.Queue or None
+        Queue the publisher puts emits on.
+
+    Attributes
+    ----------
+    alive: bool
+        False once the publisher has closed the connection or
+        dropped this subscriber. A warning is logged when it does.
+    """
+
+    def __init__(self, signal, address=None, queue=None):
+        import socket
+        from threading import Thread
+        from six.moves.queue import Queue
+
+        if (address is None) == (queue is None):
+            raise ValueError('Give one of address or queue')
+        self.signal = signal
+        self.queue = queue
+        self.alive = True
+        self._closing = False
+        self._received = Queue()
+        self._sock = None
+        if address is not None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.connect(address)
+        self._thread = Thread(target=self._receive)
+        self._thread.daemon = True
+        self._thread.start()
+        self._emitter = Thread(target=self._emit)
+        self._emitter.daemon = True
+        self._emitter.start()
+
+    def close(self):
+        """Stop receiving, then emit what was already received"""
+        import socket
+
+        self._closing = True
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                # Already disconnected by the publisher
+                pass
+            self._sock.close()
+        else:
+            self.queue.put(None)
+        self._thread.join()
+        self._emitter.join()
+
+    def _receive(self):
+        while True:
+            try:
+                if self._sock is not None:
+                    frames = _recv_frames(self._sock)
+                else:
+                    frames = self.queue.get()
+            except (OSError, EOFError):
+                frames = None
+            if frames is None:
+                break
+            self._received.put(frames)
+        self.alive = False
+        if not self._closing:
+            logger.warning('Signals subscriber disconnected by the publisher')
+        self._received.put(None)
+
+    def _emit(self):
+        while True:
+            frames = self._received.get()
+            if frames is None:
+                break
+            try:
+                args, kargs = _loads(frames)
+            except Exception:
+                logger.exception('Signals subscriber cannot unpickle an emit')
+                continue
+            try:
+                self.signal(*args, **kargs)
+            except Exception:
+                logger.exception('Signals subscriber emit failed')
+
+
+def _dumps(args, kargs):
+    """Pickle emit arguments into frames: the pickle, then each buffer"""
+    import pickle
+    buffers = []
+    payload = pickle.dumps((args, kargs), protocol=5, buffer_callback=buffers.append)
+    return [payload] + [buffer.raw() for buffer in buffers]
+
+
+def _loads(frames):
+    """Unpickle emit arguments from frames"""
+    import pickle
+    return pickle.loads(frames[0], buffers=frames[1:])
+
+
+def _send_frames(sock, frames):
+    """Send frames, prefixed by their count and lengths"""
+    import struct
+
+    header = struct.pack('!I{:d}Q'.format(len(frames)), len(frames), *[
+        memoryview(frame).nbytes for frame in frames
+    ])
+    views = [memoryview(header)] + [memoryview(frame).cast('B') for frame in frames]
+    while views:
+        sent = sock.sendmsg(views)
+        while views and sent >= views[0].nbytes:
+            sent -= views[0].nbytes
+            views.pop(0)
+        if views and sent:
+            views[0] = views[0][sent:]
+
+
+def _recv_frames(sock):
+    """Receive frames sent by `_send_frames`, None at end of stream"""
+    import struct
+
+    header = _recv_exact(sock, 4)
+    if header is None:
+        return None
+    nframes, = struct.unpack('!I', header)
+    header = _recv_exact(sock, 8 * nframes)
+    if header is None:
+        return None
+    frames = []
+    for length in struct.unpack('!{:d}Q'.format(nframes), header):
+        frame = _recv_exact(sock, length)
+        if frame is None:
+            return None
+        frames.append(frame)
+    return frames
+
+
+def _recv_exact(sock, nbytes):
+    """Receive exactly nbytes, None if the stream ends first"""
+    buf = bytearray(nbytes)
+    view = memoryview(buf)
+    while view.nbytes:
+        received = sock.recv_into(view)
+        if not received:
+            return None
+        view = view[received:]
+    return buf
+
+
+def _remove_stale_socket(address):
+    """Remove a Unix socket file nothing is listening on
+
+    Raises OSError if another process is still listening.
+    """
+    import errno
+    import os
+    import socket
+    import stat
+
+    try:
+        if not stat.S_ISSOCK(os.stat(address).st_mode):
+            return
+    except OSError:
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(address)
+    except OSError as exception:
+        if exception.errno == errno.ECONNREFUSED:
+            os.unlink(address)
+        return
+    finally:
+        probe.close()
+    raise OSError(errno.EADDRINUSE, 'Signals publisher already running', address)
+
+
+def readonly(payload, freeze=False):
+    """Return a read-only view of a buffer, without copying
+
+    NumPy arrays, astropy Tables, and objects supporting the buffer
+    protocol, such as bytearray and memoryview, get a read-only view
+    of the same memory. Anything else is returned as is.
+
+    The view holds a reference to the original, so the memory stays
+    valid for as long as any slot keeps the view, even after the
+    emitter drops its own reference. Unless `freeze` is set, the
+    emitter can still change the data through the original.
+
+    For Tables, the masks of masked columns are made read-only too.
+    Mixin columns without array flags, such as Time, are not protected.
+
+    Parameters
+    ----------
+    payload: object
+        The argument to make read-only.
+
+    freeze: bool
+        Also make a NumPy array payload itself read-only.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+
+    if np is not None and isinstance(payload, np.ndarray):
+        if freeze:
+            payload.flags.writeable = False
+        view = payload.view()
+        view.flags.writeable = False
+        return view
+    if hasattr(payload, 'itercols') and hasattr(payload, 'colnames'):
+        view = payload.__class__(payload, copy=False)
+        for column in view.itercols():
+            columns = [column]
+            if freeze:
+                columns.append(payload[column.info.name])
+            for target in columns:
+                _readonly_column(target, np)
+        return view
+    if isinstance(payload, (bytes, six.text_type)):
+        return payload
+    try:
+        return memoryview(payload).toreadonly()
+    except TypeError:
+        return payload
+
+
+def _readonly_column(column, np):
+    """Make a Table column, and its mask, read-only in place
+
+    Mixin columns without array flags, such as Time or SkyCoord,
+    are left as they are.
+    """
+    if getattr(column, 'flags', None) is None:
+        return
+    column.flags.writeable = False
+    # The column's own mask array; a view of the table's mask is not
+    # shared with the original column, so only this column is affected.
+    mask = getattr(column, '_mask', None)
+    if np is not None and isinstance(mask, np.ndarray):
+        mask.flags.writeable = False
+
+
+def _readonly_args(args, kargs, freeze=False):
+    """Apply `readonly` to all emit arguments"""
+    return (
+        tuple(readonly(arg, freeze) for arg in args),
+        dict((key, readonly(value, freeze)) for key, value in kargs.items()),
+    )
+
+
+# Executor shared by POOLED signals without their own.
+_executor = None
+
+
+def _default_executor():
+    global _executor
+    if _executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _executor = ThreadPoolExecutor()
+    return _executor
 
 
 class SignalsErrorBase(Exception):
@@ -91,19 +1273,52 @@ class SignalsNotAClass(SignalsErrorBase):
     default_message = 'Signal must be a class.'
 
 class Signals(dict):
-    '''Manage the signals.'''
+    '''Manage the signals.
+
+    Signals can be retrieved by class name as attributes.
+    A name index is kept so that lookup does not depend on the
+    number of signals. Keys without a `__name__` are kept as
+    plain dict entries.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(Signals, self).__init__()
+        self._names = {}
+        self.update(*args, **kwargs)
 
     def __setitem__(self, key, value):
         if key not in self:
             super(Signals, self).__setitem__(key, value)
+            name = getattr(key, '__name__', None)
+            if name is not None:
+                self._names.setdefault(name, key)
         else:
             warnings.warn('Signals: signal "{}" already exists.'.format(key))
 
+    def __delitem__(self, key):
+        super(Signals, self).__delitem__(key)
+        name = getattr(key, '__name__', None)
+        if name is not None and self._names.get(name) is key:
+            del self._names[name]
+            for other in self:
+                if getattr(other, '__name__', None) == name:
+                    self._names[name] = other
+                    break
+
     def __getattr__(self, key):
-        for signal in self:
-            if signal.__name__ == key:
-                return self[signal]
-        raise KeyError('{}'.format(key))
+        if key.startswith('_'):
+            raise AttributeError(key)
+        try:
+            return self[self._names[key]]
+        except KeyError:
+            raise KeyError('{}'.format(key))
+
+    def __reduce__(self):
+        # Rebuild through __init__ so the name index is recreated
+        return (self.__class__, (dict(self),))
+
+    def __copy__(self):
+        return self.__class__(self)
 
     def add(self, signal_class):
         if inspect.isclass(signal_class):
@@ -111,6 +1326,200 @@ class Signals(dict):
         else:
             raise SignalsNotAClass
 
+    def clear(self):
+        super(Signals, self).clear()
+        self._names.clear()
+
+    def copy(self):
+        return self.__copy__()
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return super(Signals, self).pop(key, *default)
+
+    def popitem(self):
+        key, value = super(Signals, self).popitem()
+        super(Signals, self).__setitem__(key, value)
+        del self[key]
+        return key, value
+
+    def remove(self, signal):
+        '''Remove a signal, given its class or class name'''
+        if isinstance(signal, six.string_types):
+            signal = self._names[signal]
+        del self[signal]
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    @contextmanager
+    def batch(self, collect=False):
+        """Batch all the signals, see `Signal.batch`"""
+        from contextlib import ExitStack
+        with ExitStack() as stack:
+            for signal in list(self.values()):
+                stack.enter_context(signal.batch(collect=collect))
+            yield self
+
+def benchmark(nslots=(1, 100, 10000), duration=1.0):
+    """Measure emits per second for signals with different numbers of slots
+
+    Half the slots are functions, half are bound methods.
+
+    Parameters
+    ----------
+    nslots: [int[,...]]
+        Number of slots to connect for each measurement.
+
+    duration: float
+        Approximate seconds to spend emitting for each measurement.
+
+    Returns
+    -------
+    {nslots: emits_per_second}
+    """
+    from time import time
+
+    class Receiver(object):
+        def slot(self, value):
+            pass
+
+    results = {}
+    for n in nslots:
+        signal = Signal()
+        keep = []
+        for idx in range(n):
+            if idx % 2:
+                receiver = Receiver()
+                signal.connect(receiver.slot)
+            else:
+                receiver = lambda value: None
+                signal.connect(receiver)
+            keep.append(receiver)
+
+        emits = 0
+        batch = max(1, 10000 // n)
+        start = time()
+        while True:
+            for _ in range(batch):
+                signal(emits)
+            emits += batch
+            elapsed = time() - start
+            if elapsed >= duration:
+                break
+        results[n] = emits / elapsed
+    return results
+
+
+def benchmark_signals(nsignals=(10, 1000, 10000), nlookups=100000):
+    """Measure attribute lookups per second in Signals registries
+
+    Parameters
+    ----------
+    nsignals: [int[,...]]
+        Number of signals in each registry measured.
+
+    nlookups: int
+        Number of lookups to time for each registry.
+
+    Returns
+    -------
+    {nsignals: lookups_per_second}
+    """
+    from time import time
+
+    results = {}
+    for n in nsignals:
+        signals = Signals()
+        for idx in range(n):
+            signals.add(type('Signal{:d}'.format(idx), (Signal,), {}))
+        name = 'Signal{:d}'.format(n - 1)
+        start = time()
+        for _ in range(nlookups):
+            getattr(signals, name)
+        results[n] = nlookups / (time() - start)
+    return results
+
+
+def stress_test(nthreads=8, duration=2.0):
+    """Emit, connect and disconnect from many threads at once
+
+    Half the threads emit continuously. The other half repeatedly
+    connect and disconnect their own functions and methods, and drop
+    receivers to be garbage collected. A permanent slot must see
+    every emit.
+
+    Returns
+    -------
+    (emits, calls, errors)
+        Emits made, calls of the permanent slot, and exceptions raised
+        in any thread. emits == calls and no errors means success.
+    """
+    import gc
+    from threading import Lock, Thread
+    from time import time
+
+    signal = Signal()
+    counter_lock = Lock()
+    counts = {'emits': 0, 'calls': 0}
+    errors = []
+
+    def permanent():
+        with counter_lock:
+            counts['calls'] += 1
+
+    signal.connect(permanent)
+
+    class Receiver(object):
+        def slot(self):
+            pass
+
+    stop = time() + duration
+
+    def emitter():
+        try:
+            while time() < stop:
+                with counter_lock:
+                    counts['emits'] += 1
+                signal()
+        except Exception as exception:
+            errors.append(exception)
+
+    def reconnector():
+        try:
+            while time() < stop:
+                receiver = Receiver()
+                func = lambda: None
+                signal.connect(receiver.slot)
+                signal.connect(func)
+                signal.disconnect(func)
+                if id(receiver) % 2:
+                    signal.disconnect(receiver.slot)
+                del receiver
+                gc.collect(0)
+        except Exception as exception:
+            errors.append(exception)
+
+    threads = [
+        Thread(target=emitter if idx % 2 else reconnector)
+        for idx in range(nthreads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts['emits'], counts['calls'], errors
+
+
 # Sample usage:
 if __name__ == '__main__':
     class Model(object):
@@ -157,3 +1566,20 @@ if __name__ == '__main__':
 
     model.changed.connect(bar)
     model.set_value(50)
+
+    print("Setting value 1000 times in a batch...")
+    with model.changed.batch():
+        for value in range(1000):
+            model.set_value(value)
+
+    print("Benchmarking emits/sec...")
+    for nslots, rate in sorted(benchmark().items()):
+        print("   {:6d} slots: {:12.1f} emits/sec".format(nslots, rate))
+
+    print("Benchmarking Signals lookups/sec...")
+    for nsignals, rate in sorted(benchmark_signals().items()):
+        print("   {:6d} signals: {:12.1f} lookups/sec".format(nsignals, rate))
+
+    print("Stress testing threaded emit/connect/disconnect...")
+    emits, calls, errors = stress_test()
+    print("   {:d} emits, {:d} calls, {:d} errors".format(emits, calls, len(errors)))
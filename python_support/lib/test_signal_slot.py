@@ -0,0 +1,99 @@
+"""Tests of the signal_slot guarantees that are easy to break
+
+Run with: pytest test_signal_slot.py
+"""
+import pytest
+
+from signal_slot import QUEUED, Signal, readonly, stress_test
+
+
+def test_stress_emit_connect_disconnect():
+    """A permanent slot sees every emit while others come and go"""
+    emits, calls, errors = stress_test(nthreads=8, duration=0.5)
+    assert not errors
+    assert emits == calls
+
+
+def test_readonly_shared_view():
+    """All slots get the same read-only view of the payload's memory"""
+    np = pytest.importorskip('numpy')
+
+    received = []
+
+    def first(payload):
+        received.append(payload)
+
+    def second(payload):
+        received.append(payload)
+
+    signal = Signal(dispatch=QUEUED, readonly=True)
+    signal.connect(first)
+    signal.connect(second)
+
+    payload = np.arange(1000000, dtype=float)
+    signal(payload)
+    signal(bytearray(b'abc'))
+    signal.join()
+
+    assert received[0] is received[1]
+    assert np.shares_memory(received[0], payload)
+    assert not received[0].flags.writeable
+    with pytest.raises(ValueError):
+        received[0][0] = 1.
+    assert received[2].readonly and received[3].readonly
+
+
+def test_readonly_outlives_emitter():
+    """The view keeps the memory alive after the emitter drops it"""
+    np = pytest.importorskip('numpy')
+
+    received = []
+
+    def slot(payload):
+        received.append(payload)
+
+    signal = Signal(readonly=True)
+    signal.connect(slot)
+    payload = np.arange(10, dtype=float)
+    signal(payload)
+    del payload
+    assert received[0][-1] == 9.
+
+
+def test_freeze():
+    """Freezing also protects the data from the emitter"""
+    np = pytest.importorskip('numpy')
+
+    def slot(payload):
+        pass
+
+    signal = Signal(readonly=True, freeze=True)
+    signal.connect(slot)
+    payload = np.zeros(10)
+    signal(payload)
+    assert not payload.flags.writeable
+
+
+def test_readonly_table_mask():
+    """Table masks are read-only in the view but not the original"""
+    np = pytest.importorskip('numpy')
+    table_module = pytest.importorskip('astropy.table')
+
+    table = table_module.Table()
+    table['a'] = table_module.MaskedColumn([1, 2, 3], mask=[False, True, False])
+    view = readonly(table)
+    with pytest.raises(ValueError):
+        view['a'][0] = np.ma.masked
+    table['a'][0] = np.ma.masked
+    assert view['a'].mask[0]
+
+
+def test_readonly_table_mixin():
+    """Mixin columns without array flags pass through"""
+    table_module = pytest.importorskip('astropy.table')
+    time_module = pytest.importorskip('astropy.time')
+
+    table = table_module.Table()
+    table['t'] = time_module.Time([58000., 58001.], format='mjd')
+    view = readonly(table)
+    assert view['t'][0] == table['t'][0]